@@ -11,10 +11,11 @@ import os
 import sys
 
 import requests
-import uvicorn
 
 
 def _build_log_config() -> dict:
+    import uvicorn
+
     config = uvicorn.config.LOGGING_CONFIG.copy()
     fmt = "[%(asctime)s] [%(name)s] [%(levelname)s]: %(message)s"
     datefmt = "%Y-%m-%d %H:%M:%S"
@@ -78,6 +79,7 @@ def run_server() -> int:
     log_config = _build_log_config()
     dictConfig(log_config)
     ensure_guest_credentials_interactive()
+    import uvicorn
     from src.api import create_app
     app = create_app()
     listen_host = os.getenv("REMOTE_VM_API_LISTEN_HOST", "0.0.0.0")
@@ -104,8 +106,7 @@ def run_client() -> int:
         print("사용 가능한 VM이 없습니다.")
         return 1
     print("VM을 선택하세요:")
-    for idx, name in enumerate(names, 1):
-        print(f"[{idx}] {name}  (사용자: 확인 중)")
+    sys.stdout.write("\n".join(f"[{idx}] {name}  (사용자: 확인 중)" for idx, name in enumerate(names, 1)) + "\n")
 
     from concurrent.futures import ThreadPoolExecutor, as_completed
     import shutil as _shutil
@@ -121,8 +122,8 @@ def run_client() -> int:
         try:
             if total > 0:
                 sys.stdout.write(f"\x1b[{total}A")
+            cols = _shutil.get_terminal_size(fallback=(120, 20)).columns
             for i, text in enumerate(labels, 1):
-                cols = _shutil.get_terminal_size(fallback=(120, 20)).columns
                 try:
                     vm_name = names[i - 1]
                     flag = active_flags.get(vm_name)
@@ -195,12 +196,14 @@ def run_client() -> int:
 
     def _fmt(sec: float | None) -> str:
         return f"~{int(sec)}s" if sec and sec > 0 else "N/A"
-    vm_running = client.get_vm_state()
+    prefetched = client.prefetch()
+    expected_times = prefetched["expected_time"]
+    vm_running = prefetched.get("vm_state")
     connect_op = "connect_warm" if vm_running else "connect_cold" if vm_running is not None else "connect"
-    et_connect = client.get_expected_time(connect_op) or client.get_expected_time("connect")
+    et_connect = expected_times.get(connect_op) or expected_times.get("connect")
 
     if method != options_raw[0]:
-        et_revert = client.get_expected_time("revert")
+        et_revert = expected_times.get("revert")
         total_et = (et_revert or 0) + (et_connect or 0)
         print(f"예상 총 시간: {_fmt(total_et)}")
         client.begin_total_progress(total_et)
@@ -214,7 +217,7 @@ def run_client() -> int:
         if res.get("status") != "done":
             print(f"복구 실패: {res.get('error')}")
             return 2
-        et_connect = client.get_expected_time("connect_warm") or et_connect
+        et_connect = expected_times.get("connect_warm") or et_connect
     else:
         print(f"예상 총 시간: {_fmt(et_connect)}")
         client.begin_total_progress(et_connect or 0)
@@ -233,7 +236,7 @@ def run_client() -> int:
     if not ip:
         print("IP를 확인할 수 없습니다.")
         return 4
-    client.launch_rdp(ip)
+    client.launch_rdp(ip, credentials=prefetched.get("guest_credentials"))
     return 0
 
 
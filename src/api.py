@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import asyncio
 from contextlib import asynccontextmanager
 import logging
 import os
-import socket
 import threading
 import time
+import zlib
 from pathlib import Path
 
-from fastapi import BackgroundTasks, FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Response
+
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as _DefaultResponse
+except ImportError:  # orjson is optional
+    from fastapi.responses import JSONResponse as _DefaultResponse
 
 from . import config as default_cfg
 from . import durations
@@ -19,6 +26,8 @@ from .config import (
     IP_POLL_INTERVAL,
     IP_POLL_TIMEOUT,
     REQUIRE_GUEST_CREDENTIALS,
+    TASK_LONG_POLL_INTERVAL_SEC,
+    TASK_LONG_POLL_MAX_SEC,
     VM_MAP,
     VM_ROOT,
     SKIP_TOOLS_WAIT_WHEN_HEADLESS,
@@ -38,13 +47,16 @@ from .models import (
     VMListResponse,
 )
 from .network import (
-    has_active_rdp_connections_tcp,
+    has_active_rdp_connections_cached,
+    invalidate_rdp_state,
     is_preferred_ip,
     renew_network,
+    tcp_probe,
     get_active_rdp_remote_ips,
     get_active_rdp_usernames,
     get_active_rdp_usernames_best,
 )
+from .vmrun import invalidate_running_vms
 from .vmware import (
     fast_wait_for_ip,
     is_vm_running,
@@ -57,6 +69,14 @@ from .vmware import (
 )
 
 
+def _etag_or_not_modified(request: Request, response: Response, body) -> Response | None:
+    etag = f'W/"{zlib.crc32(body.model_dump_json().encode()):08x}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return None
+
+
 def vmx_from_name(name: str) -> Path:
     if name in VM_MAP:
         return VM_MAP[name]
@@ -90,6 +110,8 @@ def _revert_job(vm: str, snap: str, task_id: str) -> None:
             task.finished = time.time()
             return
         run_vmrun(["revertToSnapshot", str(vmx), snap], timeout=60)
+        invalidate_rdp_state(vmx)
+        invalidate_running_vms()
         if not is_vm_running(vmx):
             task.progress = "전원 켜는 중"
             start_vm_async(vmx)
@@ -112,9 +134,7 @@ def _revert_job(vm: str, snap: str, task_id: str) -> None:
             renew_network(vmx, on_progress=lambda m: setattr(task, "progress", m))
             task.progress = "RDP 재대기"
             wait_for_rdp_ready(vmx, ip, on_progress=lambda m: setattr(task, "progress", m))
-        try:
-            socket.create_connection((ip, 3389), timeout=3).close()
-        except Exception:
+        if not tcp_probe(ip, 3389, 3):
             task.progress = "RDP 대기 초과 – 네트워크 재협상"
             renew_network(vmx, on_progress=lambda m: setattr(task, "progress", m))
             ip = wait_for_vm_ready(vmx, timeout=tout, probe_interval=probe, on_progress=lambda m: setattr(task, "progress", m))
@@ -163,24 +183,34 @@ def _connect_job(vm: str, task_id: str) -> None:
         task.finished = time.time()
 
 
+_IDLE_POLICY = IdlePolicy(
+    enabled=True,
+    check_interval_sec=IDLE_CHECK_INTERVAL_SEC,
+    mode=IDLE_SHUTDOWN_MODE,
+    only_on_pressure=IDLE_ONLY_ON_PRESSURE,
+)
+_RESOURCE_POLICY = ResourcePolicy()
+
+
 def create_app(config_module=None) -> FastAPI:
     cfg = config_module or default_cfg
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         log = logging.getLogger("src.api")
-        policy = IdlePolicy(
-            enabled=True,
-            check_interval_sec=IDLE_CHECK_INTERVAL_SEC,
-            mode=IDLE_SHUTDOWN_MODE,
-            only_on_pressure=IDLE_ONLY_ON_PRESSURE,
-        )
+        policy = _IDLE_POLICY
+        durations.register_change_callback()
         log.info("starting watchdog thread: interval=%ss mode=%s", policy.check_interval_sec, policy.mode)
         t = threading.Thread(target=_watchdog_loop, args=(policy,), daemon=True)
         t.start()
         yield
 
-    app = FastAPI(title="QA VMware API", version="1.0.0", lifespan=lifespan)
+    app = FastAPI(
+        title="QA VMware API",
+        version="1.0.0",
+        lifespan=lifespan,
+        default_response_class=_DefaultResponse,
+    )
 
     _log = logging.getLogger("src.api")
     try:
@@ -200,7 +230,7 @@ def create_app(config_module=None) -> FastAPI:
             raise RuntimeError("Missing required environment variables: GUEST_USER/GUEST_PASS")
 
     @app.get("/vms", response_model=VMListResponse)
-    def list_vms(include_active: bool = True) -> VMListResponse:
+    def list_vms(request: Request, response: Response, include_active: bool = True):
         try:
             mapping = discover_vms(cfg.VM_ROOT)
         except Exception:
@@ -208,7 +238,8 @@ def create_app(config_module=None) -> FastAPI:
         items: list[VMListItem] = []
         for n, vmx in mapping.items():
             items.append(VMListItem(name=n, vmx=str(vmx), clients=[], active=False))
-        return VMListResponse(root=str(cfg.VM_ROOT), vms=items)
+        body = VMListResponse(root=str(cfg.VM_ROOT), vms=items)
+        return _etag_or_not_modified(request, response, body) or body
 
     def _vmx_from_name_local(name: str) -> Path:
         if name in getattr(cfg, "VM_MAP", {}):
@@ -219,10 +250,11 @@ def create_app(config_module=None) -> FastAPI:
         raise HTTPException(404, detail=f"Unknown VM '{name}'")
 
     @app.get("/snapshots", response_model=SnapshotListResponse)
-    def snapshots(vm: str = "init") -> SnapshotListResponse:
+    def snapshots(request: Request, response: Response, vm: str = "init"):
         vmx = _vmx_from_name_local(vm)
         snaps = list_snapshots(vmx)
-        return SnapshotListResponse(vm=vm, snapshots=snaps)
+        body = SnapshotListResponse(vm=vm, snapshots=snaps)
+        return _etag_or_not_modified(request, response, body) or body
 
     @app.get("/rdp_clients")
     def rdp_clients(vm: str = "init"):
@@ -237,7 +269,7 @@ def create_app(config_module=None) -> FastAPI:
     def rdp_active(vm: str = "init"):
         vmx = _vmx_from_name_local(vm)
         try:
-            active = bool(has_active_rdp_connections_tcp(vmx))
+            active = bool(has_active_rdp_connections_cached(vmx))
         except Exception:
             active = False
         return {"vm": vm, "active": active}
@@ -246,7 +278,7 @@ def create_app(config_module=None) -> FastAPI:
     def rdp_used(vm: str = "init"):
         vmx = _vmx_from_name_local(vm)
         try:
-            active = bool(has_active_rdp_connections_tcp(vmx))
+            active = bool(has_active_rdp_connections_cached(vmx))
         except Exception:
             active = False
         clients: list[str] = []
@@ -278,6 +310,8 @@ def create_app(config_module=None) -> FastAPI:
         if payload.snapshot not in snaps:
             raise HTTPException(404, f"Snapshot '{payload.snapshot}' not found.")
         run_vmrun(["revertToSnapshot", str(vmx), payload.snapshot], timeout=60)
+        invalidate_rdp_state(vmx)
+        invalidate_running_vms()
         if not is_vm_running(vmx):
             start_vm_async(vmx)
         try:
@@ -309,6 +343,8 @@ def create_app(config_module=None) -> FastAPI:
                 task.finished = time.time()
                 return
             run_vmrun(["revertToSnapshot", str(vmx), snap], timeout=60)
+            invalidate_rdp_state(vmx)
+            invalidate_running_vms()
             if not is_vm_running(vmx):
                 task.progress = "전원 켜는 중"
                 start_vm_async(vmx)
@@ -324,9 +360,7 @@ def create_app(config_module=None) -> FastAPI:
             renew_network(vmx, on_progress=lambda m: setattr(task, "progress", m))
             task.progress = "IP 재확인(2차)"
             ip = wait_for_vm_ready(vmx, timeout=tout, probe_interval=probe, on_progress=lambda m: setattr(task, "progress", m))
-            try:
-                socket.create_connection((ip, 3389), timeout=3).close()
-            except Exception:
+            if not tcp_probe(ip, 3389, 3):
                 task.progress = "RDP 대기 초과 – 네트워크 재협상"
                 renew_network(vmx, on_progress=lambda m: setattr(task, "progress", m))
                 ip = wait_for_vm_ready(vmx, timeout=tout, probe_interval=probe, on_progress=lambda m: setattr(task, "progress", m))
@@ -393,23 +427,26 @@ def create_app(config_module=None) -> FastAPI:
         return ExpectedTimeResponse(vm=vm, op=op, avg_seconds=avg)
 
     @app.get("/task/{task_id}")
-    def task_status(task_id: str):
+    async def task_status(task_id: str, wait: float = 0.0):
         if task_id not in TASKS:
             raise HTTPException(404, "task not found")
-        return TASKS[task_id]
+        task = TASKS[task_id]
+        if wait > 0:
+            deadline = time.monotonic() + min(wait, TASK_LONG_POLL_MAX_SEC)
+            seen = (task.status, task.progress)
+            while task.status not in ("done", "failed") and (task.status, task.progress) == seen:
+                if time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(TASK_LONG_POLL_INTERVAL_SEC)
+        return task
 
     @app.get("/idle_policy", response_model=IdlePolicy)
     def get_idle_policy() -> IdlePolicy:
-        return IdlePolicy(
-            enabled=True,
-            check_interval_sec=IDLE_CHECK_INTERVAL_SEC,
-            mode=IDLE_SHUTDOWN_MODE,
-            only_on_pressure=IDLE_ONLY_ON_PRESSURE,
-        )
+        return _IDLE_POLICY
 
     @app.get("/resource_policy", response_model=ResourcePolicy)
     def get_resource_policy() -> ResourcePolicy:
-        return ResourcePolicy()
+        return _RESOURCE_POLICY
 
     @app.get("/guest_credentials")
     def get_guest_credentials():
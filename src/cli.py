@@ -1,21 +1,157 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List
+import ctypes
 import logging
 import shutil
 import subprocess
 import sys
-import tempfile
 import time
 import os
 
 import requests
-import tqdm
-from .config import RDP_TEMPLATE_PATH, RDP_CMD, ENABLE_CMDKEY_PRELOAD
+from requests.adapters import HTTPAdapter
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # orjson is optional
+    from json import loads as _json_loads
+from .config import CREDENTIALS_WAIT_SEC, RDP_TEMPLATE_PATH, RDP_CMD, ENABLE_CMDKEY_PRELOAD
 
 
 SUPPRESS_LIST_PRINT_ONCE: bool = False
 _LOG = logging.getLogger("src.cli")
+_CHOOSE_PROMPT = "번호 선택(Enter=1) ▶ "
+_TASK_POLL_INTERVAL_SEC = 0.2
+_TASK_LONG_POLL_WAIT_SEC = 1.0
+_VM_LIST_TTL_SEC = 30.0
+_EXPECTED_TIME_TTL_SEC = 300.0
+
+_RDP_TEMPLATE_CACHE: tuple[float, str] | None = None
+_DEFAULT_RDP_TEMPLATE = (
+    "full address:s:{ip}\n"
+    "username:s:{username}\n"
+    "authentication level:i:0\n"
+    "prompt for credentials:i:0\n"
+    "promptcredentialonce:i:1\n"
+    "negotiate security layer:i:1\n"
+    "enablecredsspsupport:i:1\n"
+)
+
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=0))
+_SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=0))
+_GET_CACHE: dict[tuple, tuple[float, dict, str | None]] = {}
+
+
+def _get_json_cached(url: str, params: dict, ttl: float, timeout: float) -> dict:
+    key = (url, tuple(sorted(params.items())))
+    hit = _GET_CACHE.get(key)
+    if hit is not None and time.monotonic() < hit[0]:
+        return hit[1]
+    headers = {"If-None-Match": hit[2]} if hit is not None and hit[2] else None
+    resp = _SESSION.get(url, params=params, headers=headers, timeout=timeout)
+    if resp.status_code == 304 and hit is not None:
+        _GET_CACHE[key] = (time.monotonic() + ttl, hit[1], hit[2])
+        return hit[1]
+    resp.raise_for_status()
+    data = _json_loads(resp.content)
+    _GET_CACHE[key] = (time.monotonic() + ttl, data, resp.headers.get("ETag"))
+    return data
+
+_TITLE_TRANSLATE: dict[int, int] = {ord(c): ord("_") for c in '<>:"/\\|?*'}
+_TITLE_TRANSLATE.update({i: ord("_") for i in range(32)})
+
+
+def _load_rdp_template() -> str | None:
+    global _RDP_TEMPLATE_CACHE
+    try:
+        mtime = RDP_TEMPLATE_PATH.stat().st_mtime
+    except OSError:
+        return None
+    cached = _RDP_TEMPLATE_CACHE
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    template = RDP_TEMPLATE_PATH.read_text(encoding="utf-8", errors="ignore")
+    if "full address:s:" not in template:
+        template += "\nfull address:s:{ip}"
+    if "username:s:" not in template:
+        template += "\nusername:s:{username}"
+    _RDP_TEMPLATE_CACHE = (mtime, template)
+    return template
+
+
+_CRED_TYPE_GENERIC = 1
+_CRED_PERSIST_LOCAL_MACHINE = 2
+
+
+def _cred_write_generic(target: str, username: str, password: str) -> bool:
+    from ctypes import wintypes
+
+    class CREDENTIALW(ctypes.Structure):
+        _fields_ = [
+            ("Flags", wintypes.DWORD),
+            ("Type", wintypes.DWORD),
+            ("TargetName", wintypes.LPWSTR),
+            ("Comment", wintypes.LPWSTR),
+            ("LastWritten", wintypes.FILETIME),
+            ("CredentialBlobSize", wintypes.DWORD),
+            ("CredentialBlob", ctypes.POINTER(ctypes.c_ubyte)),
+            ("Persist", wintypes.DWORD),
+            ("AttributeCount", wintypes.DWORD),
+            ("Attributes", ctypes.c_void_p),
+            ("TargetAlias", wintypes.LPWSTR),
+            ("UserName", wintypes.LPWSTR),
+        ]
+
+    blob = password.encode("utf-16-le")
+    blob_buf = (ctypes.c_ubyte * len(blob)).from_buffer_copy(blob) if blob else None
+    cred = CREDENTIALW()
+    cred.Type = _CRED_TYPE_GENERIC
+    cred.TargetName = target
+    cred.CredentialBlobSize = len(blob)
+    cred.CredentialBlob = ctypes.cast(blob_buf, ctypes.POINTER(ctypes.c_ubyte)) if blob_buf is not None else None
+    cred.Persist = _CRED_PERSIST_LOCAL_MACHINE
+    cred.UserName = username
+    return bool(ctypes.windll.advapi32.CredWriteW(ctypes.byref(cred), 0))
+
+
+def _read_key() -> str | None:
+    try:
+        if os.name == "nt":
+            import msvcrt
+
+            key = msvcrt.getwch()
+            if key in ("\x00", "\xe0"):
+                msvcrt.getwch()
+        else:
+            import termios
+            import tty
+
+            fd = sys.stdin.fileno()
+            saved = termios.tcgetattr(fd)
+            try:
+                tty.setcbreak(fd)
+                key = sys.stdin.read(1)
+            finally:
+                termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+    except Exception:
+        return None
+    if key == "\x03":
+        raise KeyboardInterrupt
+    return key or None
+
+
+@lru_cache(maxsize=8)
+def _which(name: str) -> str | None:
+    return shutil.which(name)
+
+
+@lru_cache(maxsize=32)
+def _render_rdp_template(template: str, ip: str, username: str) -> str:
+    return template.replace("{ip}", ip).replace("{username}", username)
 
 
 class VMClient:
@@ -26,20 +162,23 @@ class VMClient:
 
     def get_expected_time(self, op: str) -> float | None:
         try:
-            resp = requests.get(f"{self.api_base}/expected_time", params={"vm": self.vm_name, "op": op}, timeout=5)
-            resp.raise_for_status()
-            return resp.json().get("avg_seconds")
+            data = _get_json_cached(
+                f"{self.api_base}/expected_time",
+                {"vm": self.vm_name, "op": op},
+                _EXPECTED_TIME_TTL_SEC,
+                5,
+            )
+            return data.get("avg_seconds")
         except requests.RequestException:
             return None
 
     def get_snapshot_list(self) -> List[str]:
-        resp = requests.get(f"{self.api_base}/snapshots", params={"vm": self.vm_name}, timeout=10)
-        resp.raise_for_status()
-        return resp.json().get("snapshots", [])
+        data = _get_json_cached(f"{self.api_base}/snapshots", {"vm": self.vm_name}, 0.0, 10)
+        return data.get("snapshots", [])
 
     def get_rdp_clients(self, vm_name: str) -> List[str]:
         try:
-            resp = requests.get(f"{self.api_base}/rdp_clients", params={"vm": vm_name}, timeout=5)
+            resp = _SESSION.get(f"{self.api_base}/rdp_clients", params={"vm": vm_name}, timeout=5)
             resp.raise_for_status()
             data = resp.json()
             items = data.get("clients") or []
@@ -49,7 +188,7 @@ class VMClient:
 
     def get_rdp_active(self, vm_name: str) -> bool:
         try:
-            resp = requests.get(f"{self.api_base}/rdp_active", params={"vm": vm_name}, timeout=1)
+            resp = _SESSION.get(f"{self.api_base}/rdp_active", params={"vm": vm_name}, timeout=1)
             resp.raise_for_status()
             data = resp.json()
             return bool(data.get("active"))
@@ -59,7 +198,7 @@ class VMClient:
     def get_rdp_used(self, vm_name: str) -> tuple[bool, list[str]]:
         url = f"{self.api_base}/rdp_used"
         _LOG.debug("GET %s vm=%s", url, vm_name)
-        resp = requests.get(url, params={"vm": vm_name}, timeout=15)
+        resp = _SESSION.get(url, params={"vm": vm_name}, timeout=15)
         resp.raise_for_status()
         data = resp.json()
         active = bool(data.get("active"))
@@ -68,27 +207,25 @@ class VMClient:
         return active, clients
 
     def get_vm_list(self) -> List[str]:
-        resp = requests.get(f"{self.api_base}/vms", params={"include_active": "false"}, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = _get_json_cached(f"{self.api_base}/vms", {"include_active": "false"}, _VM_LIST_TTL_SEC, 10)
         items = data.get("vms", [])
         names = [item.get("name") for item in items if isinstance(item, dict) and item.get("name")]
         names.sort()
         return names
 
     def get_vm_list_with_clients(self) -> list[dict]:
-        resp = requests.get(f"{self.api_base}/vms", params={"include_active": "true"}, timeout=20)
+        resp = _SESSION.get(f"{self.api_base}/vms", params={"include_active": "true"}, timeout=20)
         resp.raise_for_status()
         data = resp.json()
         return data.get("vms", [])
 
     def connect_async(self) -> str:
-        resp = requests.post(f"{self.api_base}/connect_async", json={"vm": self.vm_name}, timeout=10)
+        resp = _SESSION.post(f"{self.api_base}/connect_async", json={"vm": self.vm_name}, timeout=10)
         resp.raise_for_status()
         return resp.json()["task_id"]
 
     def revert_async(self, snapshot: str) -> str:
-        resp = requests.post(f"{self.api_base}/revert_async", json={"vm": self.vm_name, "snapshot": snapshot}, timeout=10)
+        resp = _SESSION.post(f"{self.api_base}/revert_async", json={"vm": self.vm_name, "snapshot": snapshot}, timeout=10)
         resp.raise_for_status()
         return resp.json()["task_id"]
 
@@ -97,8 +234,12 @@ class VMClient:
         use_bar = isinstance(expected, (int, float)) and (expected or 0) > 0
         pbar = None
         last_shown = 0.0
+        cols = 0
+        cols_at = float("-inf")
         try:
             if use_bar:
+                import tqdm
+
                 gp = getattr(self, "_global_progress", None)
                 total_secs = int(round(float(gp.get("expected", expected)))) if isinstance(gp, dict) else int(round(float(expected)))
                 pbar = tqdm.tqdm(
@@ -112,7 +253,15 @@ class VMClient:
                 pbar.set_description_str(f"0/{total_secs}s | {total_secs}s 남음 | 대기 중")
 
             while True:
-                r = requests.get(f"{self.api_base}/task/{task_id}", timeout=5).json()
+                req_start = time.perf_counter()
+                r = _json_loads(
+                    _SESSION.get(
+                        f"{self.api_base}/task/{task_id}",
+                        params={"wait": _TASK_LONG_POLL_WAIT_SEC},
+                        timeout=5 + _TASK_LONG_POLL_WAIT_SEC,
+                    ).content
+                )
+                req_elapsed = time.perf_counter() - req_start
                 status = r["status"]
                 progress = r.get("progress", "")
                 elapsed = time.perf_counter() - start
@@ -143,9 +292,10 @@ class VMClient:
                 else:
                     total_eta = self._compute_total_eta()
                     line = self._render_progress(elapsed, expected, status, progress, total_eta=total_eta)
-                    cols = shutil.get_terminal_size(fallback=(120, 20)).columns
-                    sys.stdout.write("\r" + " " * (cols - 1) + "\r")
-                    sys.stdout.write(line[: cols - 1])
+                    if elapsed - cols_at >= 5.0:
+                        cols = shutil.get_terminal_size(fallback=(120, 20)).columns
+                        cols_at = elapsed
+                    sys.stdout.write("\r\x1b[2K" + line[: cols - 1])
                     sys.stdout.flush()
 
                 if status in ("done", "failed"):
@@ -159,7 +309,7 @@ class VMClient:
                         print()
                     return r
                 last_shown = elapsed
-                time.sleep(0.2)
+                time.sleep(max(0.0, _TASK_POLL_INTERVAL_SEC - req_elapsed))
         finally:
             if pbar is not None:
                 try:
@@ -218,30 +368,79 @@ class VMClient:
 
     def get_vm_state(self) -> bool | None:
         try:
-            resp = requests.get(f"{self.api_base}/vm_state", params={"vm": self.vm_name}, timeout=5)
+            resp = _SESSION.get(f"{self.api_base}/vm_state", params={"vm": self.vm_name}, timeout=5)
             resp.raise_for_status()
             data = resp.json()
             return bool(data.get("running"))
         except requests.RequestException:
             return None
 
+    def get_guest_credentials(self) -> tuple[str, str]:
+        try:
+            cred = _SESSION.get(f"{self.api_base}/guest_credentials", timeout=5).json()
+            return (cred.get("guest_user") or "").strip(), (cred.get("guest_pass") or "").strip()
+        except Exception:
+            return "", ""
+
+    def prefetch(
+        self,
+        ops: tuple[str, ...] = ("guest_credentials", "vm_state", "expected_time"),
+        expected_ops: tuple[str, ...] = ("connect", "connect_warm", "connect_cold", "revert"),
+    ) -> dict:
+        jobs: dict[str, tuple] = {}
+        if "guest_credentials" in ops:
+            jobs["guest_credentials"] = (self.get_guest_credentials,)
+        if "vm_state" in ops:
+            jobs["vm_state"] = (self.get_vm_state,)
+        if "expected_time" in ops:
+            for op in expected_ops:
+                jobs[f"expected_time:{op}"] = (self.get_expected_time, op)
+        results: dict = {"expected_time": {}}
+        if not jobs:
+            return results
+        with ThreadPoolExecutor(max_workers=min(len(jobs), 8), thread_name_prefix="prefetch") as pool:
+            futures = {key: pool.submit(*job) for key, job in jobs.items()}
+        for key, fut in futures.items():
+            try:
+                value = fut.result()
+            except Exception:
+                value = None
+            if key.startswith("expected_time:"):
+                results["expected_time"][key.split(":", 1)[1]] = value
+            else:
+                results[key] = value
+        return results
+
     @staticmethod
     def choose(items: List[str]) -> str:
         global SUPPRESS_LIST_PRINT_ONCE
         if not SUPPRESS_LIST_PRINT_ONCE:
-            for idx, item in enumerate(items, 1):
-                print(f"[{idx}] {item}")
+            if items:
+                sys.stdout.write("\n".join(f"[{idx}] {item}" for idx, item in enumerate(items, 1)) + "\n")
+                sys.stdout.flush()
         else:
             SUPPRESS_LIST_PRINT_ONCE = False
-        prompt = "번호 선택(Enter=1) ▶ "
+        len_items = len(items)
+        single_key = 0 < len_items < 10 and sys.stdin.isatty() and sys.stdout.isatty()
         while True:
-            sel_str = input(prompt).strip()
+            if single_key:
+                sys.stdout.write(_CHOOSE_PROMPT)
+                sys.stdout.flush()
+                key = _read_key()
+                if key is None:
+                    single_key = False
+                    print()
+                    continue
+                sel_str = "" if key in ("\r", "\n") else key
+                print(sel_str)
+            else:
+                sel_str = input(_CHOOSE_PROMPT).strip()
             if sel_str == "":
                 print()
                 return items[0]
-            if sel_str.isdigit():
+            if sel_str.isascii() and sel_str.isdigit():
                 sel = int(sel_str) - 1
-                if 0 <= sel < len(items):
+                if 0 <= sel < len_items:
                     print()
                     return items[sel]
             print("잘못된 입력, 다시 시도하세요.")
@@ -272,15 +471,13 @@ class VMClient:
 
     @staticmethod
     def create_rdp_file(ip: str, username: str) -> str:
-        if RDP_TEMPLATE_PATH.exists():
-            template = RDP_TEMPLATE_PATH.read_text(encoding="utf-8", errors="ignore")
-            rdp_content = template.replace("{ip}", ip).replace("{username}", username)
-            if "full address:s:" not in rdp_content:
-                rdp_content += f"\nfull address:s:{ip}"
-            if "username:s:" not in rdp_content:
-                rdp_content += f"\nusername:s:{username}"
+        template = _load_rdp_template()
+        if template is not None:
+            rdp_content = _render_rdp_template(template, ip, username)
         else:
-            rdp_content = f"full address:s:{ip}\nusername:s:{username}\nauthentication level:i:0\nprompt for credentials:i:0\npromptcredentialonce:i:1\nnegotiate security layer:i:1\nenablecredsspsupport:i:1\n"
+            rdp_content = _DEFAULT_RDP_TEMPLATE.format_map({"ip": ip, "username": username})
+        import tempfile
+
         tmp = tempfile.NamedTemporaryFile(mode="w", suffix=".rdp", delete=False)
         tmp.write(rdp_content)
         tmp.close()
@@ -291,7 +488,12 @@ class VMClient:
         try:
             if os.name != "nt":
                 return
-            cmdkey_path = shutil.which("cmdkey")
+            try:
+                if _cred_write_generic(f"TERMSRV/{ip}", username, password):
+                    return
+            except Exception as exc:
+                _LOG.debug("CredWriteW failed, falling back to cmdkey: %s", exc)
+            cmdkey_path = _which("cmdkey")
             if not cmdkey_path:
                 return
             args = [
@@ -304,19 +506,27 @@ class VMClient:
         except Exception:
             pass
 
-    def launch_rdp(self, ip: str) -> None:
+    def launch_rdp(self, ip: str, credentials: tuple[str, str] | None = None) -> None:
+        cred_future = None
+        if credentials is None:
+            cred_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cred")
+            cred_future = cred_pool.submit(self.get_guest_credentials)
+            cred_pool.shutdown(wait=False)
         print(f"원격 데스크톱 연결 시작: {ip}")
         print()
-        try:
-            cred = requests.get(f"{self.api_base}/guest_credentials", timeout=5).json()
-            guest_user = (cred.get("guest_user") or "").strip()
-            guest_pass = (cred.get("guest_pass") or "").strip()
-        except Exception:
-            guest_user = ""
-            guest_pass = ""
+        if cred_future is not None:
+            try:
+                credentials = cred_future.result(timeout=CREDENTIALS_WAIT_SEC)
+            except Exception:
+                _LOG.debug("guest_credentials not ready within %.1fs; launching without them", CREDENTIALS_WAIT_SEC)
+                print(f"서버 자격 증명 응답이 {CREDENTIALS_WAIT_SEC:g}초 내에 오지 않아 자동 로그인 없이 연결합니다.")
+                credentials = ("", "")
+        guest_user, guest_pass = credentials or ("", "")
 
         if guest_user and guest_pass:
             print("서버 제공 자격 증명으로 자동 로그인을 시도합니다.")
+        elif not ENABLE_CMDKEY_PRELOAD:
+            print("ENABLE_CMDKEY_PRELOAD가 꺼져 있어 자동 로그인을 진행하지 않습니다.")
         else:
             print("서버에 저장된 계정/비밀번호가 없어 자동 로그인을 진행할 수 없습니다.")
         print()
@@ -331,10 +541,10 @@ class VMClient:
             rdp_file = self.create_rdp_file(ip, username=guest_user)
             try:
                 title = (self.vm_name or ip).strip()
-                title = "".join((c if c not in '<>:"/\\|?*' and ord(c) >= 32 else "_") for c in title).rstrip(" .")
+                title = title.translate(_TITLE_TRANSLATE).rstrip(" .")
                 if not title:
                     title = "connection"
-                target_path = os.path.join(tempfile.gettempdir(), f"{title}.rdp")
+                target_path = os.path.join(os.path.dirname(rdp_file), f"{title}.rdp")
                 try:
                     os.replace(rdp_file, target_path)
                     launch_path = target_path
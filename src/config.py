@@ -2,23 +2,34 @@ from __future__ import annotations
 
 import ipaddress
 import os
+import re
 from pathlib import Path
 
 
+_TRUE = frozenset({"1", "true", "yes", "on"})
+_LIST_SEP = re.compile(r"[;,]")
+
+
+def _envbool(name: str, default: str) -> bool:
+    return (os.getenv(name, default) or "").strip().lower() in _TRUE
+
+
 VMRUN: Path = Path(os.getenv("VMRUN_PATH", r"C:\\Program Files (x86)\\VMware\\VMware Workstation\\vmrun.exe"))
+VMRUN_MAX_CONCURRENCY: int = max(1, int(os.getenv("VMRUN_MAX_CONCURRENCY", "8")))
 VM_ROOT: Path = Path(os.getenv("VM_ROOT", r"C:\\VMware"))
 RDP_TEMPLATE_PATH: Path = Path(
     os.getenv("RDP_TEMPLATE_PATH", "") or (Path(__file__).parents[1] / "templates" / "rdp_template.rdp")
 )
 RDP_CMD: str = os.getenv("RDP_CMD", "mstsc")
-ENABLE_CMDKEY_PRELOAD: bool = os.getenv("ENABLE_CMDKEY_PRELOAD", "true").strip().lower() in {"1", "true", "yes"}
+ENABLE_CMDKEY_PRELOAD: bool = _envbool("ENABLE_CMDKEY_PRELOAD", "true")
+CREDENTIALS_WAIT_SEC: float = float(os.getenv("CREDENTIALS_WAIT_SEC", "5"))
 
 def _load_alias_map_from_env() -> dict[str, Path]:
     raw = os.getenv("VM_ALIASES", "").strip()
     if not raw:
         return {}
     pairs: dict[str, Path] = {}
-    for part in raw.replace(",", ";").split(";"):
+    for part in _LIST_SEP.split(raw):
         part = part.strip()
         if not part or "=" not in part:
             continue
@@ -43,39 +54,49 @@ GUEST_PASS, GUEST_PASS_FROM_ENV = _get_env_with_flag("GUEST_PASS", "")
 
 IP_POLL_INTERVAL: float = float(os.getenv("IP_POLL_INTERVAL", "0.2"))
 IP_POLL_TIMEOUT: int = int(os.getenv("IP_POLL_TIMEOUT", "120"))
+ADAPTIVE_POLL: bool = _envbool("ADAPTIVE_POLL", "true")
+ADAPTIVE_POLL_BACKOFF: float = max(1.0, float(os.getenv("ADAPTIVE_POLL_BACKOFF", "1.3")))
+ADAPTIVE_POLL_MAX_INTERVAL_SEC: float = float(os.getenv("ADAPTIVE_POLL_MAX_INTERVAL_SEC", "1.5"))
+
+TASK_LONG_POLL_MAX_SEC: float = float(os.getenv("TASK_LONG_POLL_MAX_SEC", "5"))
+TASK_LONG_POLL_INTERVAL_SEC: float = float(os.getenv("TASK_LONG_POLL_INTERVAL_SEC", "0.05"))
 
 _pref_env = os.getenv("PREFERRED_SUBNETS", "192.168.0.0/22")
-PREFERRED_SUBNETS = [ipaddress.ip_network(net.strip()) for net in _pref_env.split(',') if net.strip()]
+PREFERRED_SUBNETS = [ipaddress.ip_network(net) for net in (p.strip() for p in _pref_env.split(",")) if net]
 _ex_env = os.getenv("EXCLUDE_SUBNETS", "")
-EXCLUDE_SUBNETS = [ipaddress.ip_network(net.strip()) for net in _ex_env.split(',') if net.strip()]
+EXCLUDE_SUBNETS = [ipaddress.ip_network(net) for net in (p.strip() for p in _ex_env.split(",")) if net]
 
 ENABLE_IDLE_WATCHDOG: bool = True
 IDLE_CHECK_INTERVAL_SEC: int = int(os.getenv("IDLE_CHECK_INTERVAL_SEC", "20"))
 IDLE_SHUTDOWN_MODE: str = os.getenv("IDLE_SHUTDOWN_MODE", "soft")
-IDLE_ONLY_ON_PRESSURE: bool = os.getenv("IDLE_ONLY_ON_PRESSURE", "true").strip().lower() in {"1", "true", "yes"}
+IDLE_ONLY_ON_PRESSURE: bool = _envbool("IDLE_ONLY_ON_PRESSURE", "true")
 RDP_PORT: int = int(os.getenv("RDP_PORT", "3389"))
 
 RDP_PS_TIMEOUT_SEC: int = int(os.getenv("RDP_PS_TIMEOUT_SEC", "10"))
 RDP_QUSER_TIMEOUT_SEC: int = int(os.getenv("RDP_QUSER_TIMEOUT_SEC", "6"))
 
 TCP_PROBE_TIMEOUT_SEC: float = float(os.getenv("TCP_PROBE_TIMEOUT_SEC", "1.0"))
+GUEST_IP_CACHE_TTL_SEC: float = float(os.getenv("GUEST_IP_CACHE_TTL_SEC", "5"))
 
-ENABLE_TOOLS_SELF_HEAL: bool = os.getenv("ENABLE_TOOLS_SELF_HEAL", "true").strip().lower() in {"1", "true", "yes"}
+ENABLE_TOOLS_SELF_HEAL: bool = _envbool("ENABLE_TOOLS_SELF_HEAL", "true")
 TOOLS_RESTART_COOLDOWN_SEC: int = int(os.getenv("TOOLS_RESTART_COOLDOWN_SEC", "600"))
 
 MIN_AVAILABLE_MEM_GB: float = float(os.getenv("MIN_AVAILABLE_MEM_GB", "4"))
 MAX_SHUTDOWNS_PER_TICK: int = int(os.getenv("MAX_SHUTDOWNS_PER_TICK", "2"))
 CPU_PRESSURE_THRESHOLD_PCT: int = int(os.getenv("CPU_PRESSURE_THRESHOLD_PCT", "90"))
 CPU_SAMPLE_DURATION_SEC: float = float(os.getenv("CPU_SAMPLE_DURATION_SEC", "1.0"))
+METRICS_CACHE_TTL_SEC: float = float(os.getenv("METRICS_CACHE_TTL_SEC", str(max(1, IDLE_CHECK_INTERVAL_SEC // 2))))
 CPU_CONSECUTIVE_TICKS: int = int(os.getenv("CPU_CONSECUTIVE_TICKS", "3"))
 
 RDP_CHECK_CONCURRENCY: int = max(1, int(os.getenv("RDP_CHECK_CONCURRENCY", "2")))
 RDP_CHECK_BATCH_SIZE: int = max(0, int(os.getenv("RDP_CHECK_BATCH_SIZE", "0")))
+RDP_CHECK_BUDGET_SEC: float = max(0.0, float(os.getenv("RDP_CHECK_BUDGET_SEC", "15")))
+VALIDATE_RUNNING_VMX_EXISTS: bool = _envbool("VALIDATE_RUNNING_VMX_EXISTS", "false")
 
-REQUIRE_GUEST_CREDENTIALS: bool = os.getenv("REQUIRE_GUEST_CREDENTIALS", "false").strip().lower() in {"1", "true", "yes"}
+REQUIRE_GUEST_CREDENTIALS: bool = _envbool("REQUIRE_GUEST_CREDENTIALS", "false")
 
-SKIP_TOOLS_WAIT_WHEN_HEADLESS: bool = os.getenv("SKIP_TOOLS_WAIT_WHEN_HEADLESS", "true").strip().lower() in {"1", "true", "yes"}
-ENABLE_HEADLESS_IP_FALLBACK: bool = os.getenv("ENABLE_HEADLESS_IP_FALLBACK", "true").strip().lower() in {"1", "true", "yes"}
+SKIP_TOOLS_WAIT_WHEN_HEADLESS: bool = _envbool("SKIP_TOOLS_WAIT_WHEN_HEADLESS", "true")
+ENABLE_HEADLESS_IP_FALLBACK: bool = _envbool("ENABLE_HEADLESS_IP_FALLBACK", "true")
 
 DHCP_LEASES_PATHS_RAW: str = os.getenv("DHCP_LEASES_PATHS", "").strip()
 
@@ -88,6 +109,6 @@ RDP_ACTIVE_SCAN_MAX_WORKERS: int = max(1, int(os.getenv("RDP_ACTIVE_SCAN_MAX_WOR
 RDP_CLIENTS_SCAN_MAX_WORKERS: int = max(1, int(os.getenv("RDP_CLIENTS_SCAN_MAX_WORKERS", "2")))
 RDP_HINT_MAX_WORKERS: int = max(1, int(os.getenv("RDP_HINT_MAX_WORKERS", "8")))
 
-RDP_MONITOR_ENABLED: bool = os.getenv("RDP_MONITOR_ENABLED", "true").strip().lower() in {"1", "true", "yes"}
+RDP_MONITOR_ENABLED: bool = _envbool("RDP_MONITOR_ENABLED", "true")
 RDP_MONITOR_INTERVAL_SEC: int = int(os.getenv("RDP_MONITOR_INTERVAL_SEC", "20"))
 RDP_MONITOR_MAX_WORKERS: int = max(1, int(os.getenv("RDP_MONITOR_MAX_WORKERS", "2")))
@@ -1,36 +1,91 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
+import os
 from pathlib import Path
 from typing import Dict
 
+from .config import RDP_HINT_MAX_WORKERS
 
-def _choose_vmx_for_directory(directory: Path) -> Path | None:
-    if not directory.is_dir():
-        return None
 
-    dir_key = directory.name.lower().replace(" ", "")
+_CHOICE_CACHE: dict[str, tuple[int, Path, int]] = {}
+_SKIP_DIRS = frozenset({"caches", ".git", "__pycache__", "node_modules"})
+
+
+def _walk_vmx(directory: Path) -> list[Path]:
+    found: list[Path] = []
+    stack = [str(directory)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        if e.name.lower() not in _SKIP_DIRS:
+                            stack.append(e.path)
+                    elif e.name[-4:].lower() == ".vmx" and e.is_file():
+                        found.append(Path(e.path))
+        except OSError:
+            continue
+    return found
+
 
-    candidates: list[Path] = sorted(directory.rglob("*.vmx"))
+def _choose_vmx_for_directory(directory: Path) -> Path | None:
+    direct = directory / f"{directory.name}.vmx"
+    if direct.is_file():
+        return direct
+
+    candidates: list[Path] = sorted(_walk_vmx(directory))
     if not candidates:
         return None
 
-    for vmx in candidates:
-        stem_key = vmx.stem.lower().replace(" ", "")
-        if stem_key == dir_key:
-            return vmx
+    dir_key = directory.name.casefold().replace(" ", "")
+    match = next((v for v in candidates if v.stem.casefold().replace(" ", "") == dir_key), None)
+    return match or candidates[0]
+
 
-    return candidates[0]
+def _mtime_ns(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return -1
 
 
 def discover_vms(root: Path) -> Dict[str, Path]:
     mapping: dict[str, Path] = {}
-    if not root.exists() or not root.is_dir():
+    if not root.is_dir():
         return mapping
 
-    for entry in sorted(root.iterdir()):
-        if not entry.is_dir():
-            continue
-        chosen = _choose_vmx_for_directory(entry)
+    with os.scandir(root) as it:
+        dir_entries = sorted((e for e in it if e.is_dir()), key=lambda e: e.name)
+    entries = [Path(e.path) for e in dir_entries]
+    mtimes = [e.stat().st_mtime_ns for e in dir_entries]
+    chosen_list: list[Path | None] = [None] * len(entries)
+    misses: list[int] = []
+    for i, (entry, mtime) in enumerate(zip(entries, mtimes)):
+        hit = _CHOICE_CACHE.get(str(entry))
+        if hit is not None and hit[0] == mtime and _mtime_ns(hit[1]) == hit[2]:
+            chosen_list[i] = hit[1]
+        else:
+            misses.append(i)
+
+    miss_paths = [entries[i] for i in misses]
+    if RDP_HINT_MAX_WORKERS > 1 and len(miss_paths) > 1:
+        max_workers = max(1, min(RDP_HINT_MAX_WORKERS, len(miss_paths)))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vmscan") as pool:
+            scanned = list(pool.map(_choose_vmx_for_directory, miss_paths))
+    else:
+        scanned = [_choose_vmx_for_directory(entry) for entry in miss_paths]
+    for i, chosen in zip(misses, scanned):
+        chosen_list[i] = chosen
+        if chosen is None:
+            _CHOICE_CACHE.pop(str(entries[i]), None)
+        else:
+            _CHOICE_CACHE[str(entries[i])] = (mtimes[i], chosen, _mtime_ns(chosen))
+    live = {str(entry) for entry in entries}
+    for key in [k for k in _CHOICE_CACHE if k not in live and Path(k).parent == root]:
+        del _CHOICE_CACHE[key]
+
+    for entry, chosen in zip(entries, chosen_list):
         if chosen is not None:
             mapping[entry.name] = chosen
     return mapping
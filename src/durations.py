@@ -1,35 +1,175 @@
 from __future__ import annotations
 
+from array import array
+import atexit
+from collections import deque
+import struct
+import threading
+from typing import Callable
+
+from .envutils import watch_registry_key
+
 try:
     import winreg  # type: ignore
 except Exception:  # ImportError on non-Windows
     winreg = None  # type: ignore
 
 
+_FLUSH_EVERY = 5
+_STATS = struct.Struct("<dI")
+
+
 if winreg is not None:
-    _REG_KEY = winreg.CreateKey(winreg.HKEY_CURRENT_USER, r"Software\\QA_VM_API\\Durations")
+    _REG_KEY = winreg.CreateKeyEx(
+        winreg.HKEY_CURRENT_USER,
+        r"Software\\QA_VM_API\\Durations",
+        0,
+        winreg.KEY_READ | winreg.KEY_WRITE,
+    )
+    _CACHE: dict[str, deque[float]] = {}
+    _SUMS: dict[str, float] = {}
+    _COLD_STATS: dict[str, tuple[float, int]] = {}
+    _DIRTY: set[str] = set()
+    _KNOWN: dict[str, bytes] = {}
+    _PENDING = 0
+    _LOCK = threading.Lock()
 
     def _load_samples(name: str) -> list[float]:
         try:
-            data, _ = winreg.QueryValueEx(_REG_KEY, name)
-            return [float(x) for x in data.split(',') if x]
+            data, typ = winreg.QueryValueEx(_REG_KEY, name)
+            if typ == winreg.REG_BINARY:
+                data = data or b""
+                _KNOWN[name] = data
+                arr = array("f")
+                arr.frombytes(data[: len(data) // arr.itemsize * arr.itemsize])
+                return arr.tolist()
+            return list(map(float, filter(None, data.split(','))))
         except FileNotFoundError:
             return []
         except OSError:
             return []
 
+    def _load_stats(name: str) -> tuple[float, int] | None:
+        try:
+            data, typ = winreg.QueryValueEx(_REG_KEY, f"{name}.stats")
+        except OSError:
+            return None
+        if typ != winreg.REG_BINARY or not data or len(data) != _STATS.size:
+            return None
+        return _STATS.unpack(data)
+
+    def _cached_samples(name: str, limit: int | None = None) -> deque[float]:
+        samples = _CACHE.get(name)
+        if samples is None or (limit is not None and samples.maxlen != limit):
+            seed = list(samples) if samples is not None else _load_samples(name)
+            samples = deque(seed, maxlen=limit or 10)
+            _CACHE[name] = samples
+            _SUMS[name] = sum(samples)
+            _COLD_STATS.pop(name, None)
+        return samples
+
+    def _flush_locked() -> None:
+        global _PENDING
+        for name in list(_DIRTY):
+            samples = _CACHE.get(name)
+            if samples is None:
+                continue
+            _SUMS[name] = sum(samples)
+            blob = array("f", samples).tobytes()
+            _KNOWN[name] = blob
+            try:
+                winreg.SetValueEx(_REG_KEY, name, 0, winreg.REG_BINARY, blob)
+                winreg.SetValueEx(
+                    _REG_KEY,
+                    f"{name}.stats",
+                    0,
+                    winreg.REG_BINARY,
+                    _STATS.pack(_SUMS[name], len(samples)),
+                )
+            except OSError:
+                continue
+            _DIRTY.discard(name)
+        _PENDING = 0
+
+    def flush() -> None:
+        with _LOCK:
+            _flush_locked()
+
     def record_duration(name: str, secs: float, limit: int = 10) -> None:
-        samples = _load_samples(name)
-        samples.append(secs)
-        samples = samples[-limit:]
-        winreg.SetValueEx(_REG_KEY, name, 0, winreg.REG_SZ, ','.join(f"{s:.1f}" for s in samples))
+        global _PENDING
+        with _LOCK:
+            samples = _cached_samples(name, limit)
+            if len(samples) == samples.maxlen:
+                _SUMS[name] -= samples[0]
+            samples.append(secs)
+            _SUMS[name] += secs
+            _DIRTY.add(name)
+            _PENDING += 1
+            if _PENDING >= _FLUSH_EVERY:
+                _flush_locked()
 
     def average_duration(name: str) -> float | None:
-        samples = _load_samples(name)
-        if not samples:
+        with _LOCK:
+            samples = _CACHE.get(name)
+            if samples is None:
+                stats = _COLD_STATS.get(name) or _load_stats(name)
+                if stats is not None:
+                    _COLD_STATS[name] = stats
+                    total, count = stats
+                    return total / count if count else None
+                samples = _cached_samples(name)
+            if not samples:
+                return None
+            return _SUMS[name] / len(samples)
+
+    _CALLBACKS: list[Callable[[], None]] = []
+    _WATCHER: threading.Thread | None = None
+
+    def _registry_blob(name: str) -> bytes | None:
+        try:
+            data, typ = winreg.QueryValueEx(_REG_KEY, name)
+        except OSError:
             return None
-        return sum(samples) / len(samples)
+        return data if typ == winreg.REG_BINARY else None
+
+    def _invalidate_external() -> None:
+        with _LOCK:
+            for name in list(_CACHE):
+                if name in _DIRTY:
+                    continue
+                if name in _KNOWN and _registry_blob(name) == _KNOWN[name]:
+                    continue
+                _CACHE.pop(name, None)
+                _SUMS.pop(name, None)
+                _KNOWN.pop(name, None)
+            for name, stats in list(_COLD_STATS.items()):
+                if _load_stats(name) != stats:
+                    _COLD_STATS.pop(name, None)
+
+    def _on_registry_change() -> None:
+        _invalidate_external()
+        for cb in list(_CALLBACKS):
+            try:
+                cb()
+            except Exception:
+                pass
+
+    def register_change_callback(cb: Callable[[], None] | None = None) -> None:
+        global _WATCHER
+        with _LOCK:
+            if cb is not None:
+                _CALLBACKS.append(cb)
+            if _WATCHER is None:
+                _WATCHER = watch_registry_key(_REG_KEY.handle, _on_registry_change, "durations-regwatch")
+
+    atexit.register(flush)
 else:
+    def flush() -> None:  # type: ignore[no-redef]
+        return None
+
+    def register_change_callback(cb: Callable[[], None] | None = None) -> None:  # type: ignore[no-redef]
+        return None
+
     def record_duration(name: str, secs: float, limit: int = 10) -> None:  # type: ignore[no-redef]
         return None
 
@@ -1,15 +1,105 @@
 from __future__ import annotations
 
+from functools import lru_cache
 import getpass
 import logging
 import os
-import subprocess
+import sys
+import threading
 from typing import Callable
 
+if os.name == "nt":
+    from ntpath import normcase as _normcase, normpath as _normpath
+else:
+    from posixpath import normcase as _normcase, normpath as _normpath
+
 
 _LOG = logging.getLogger("src.envutils")
 
 
+_MACHINE_ENV_KEY = r"SYSTEM\CurrentControlSet\Control\Session Manager\Environment"
+_USER_ENV_KEY = "Environment"
+_HWND_BROADCAST = 0xFFFF
+_WM_SETTINGCHANGE = 0x001A
+_SMTO_ABORTIFHUNG = 0x0002
+_REG_NOTIFY_CHANGE_LAST_SET = 0x00000004
+_INFINITE = 0xFFFFFFFF
+
+
+def watch_registry_key(handle: int, on_change: Callable[[], None], name: str) -> threading.Thread:
+    def _run() -> None:
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        advapi32 = ctypes.windll.advapi32
+        kernel32.CreateEventW.restype = ctypes.c_void_p
+        event = kernel32.CreateEventW(None, False, False, None)
+        if not event:
+            return
+        try:
+            while True:
+                rc = advapi32.RegNotifyChangeKeyValue(
+                    ctypes.c_void_p(handle),
+                    True,
+                    _REG_NOTIFY_CHANGE_LAST_SET,
+                    ctypes.c_void_p(event),
+                    True,
+                )
+                if rc != 0:
+                    return
+                kernel32.WaitForSingleObject(ctypes.c_void_p(event), _INFINITE)
+                try:
+                    on_change()
+                except Exception as exc:
+                    _LOG.debug("%s change handler failed: %s", name, exc)
+        finally:
+            kernel32.CloseHandle(ctypes.c_void_p(event))
+
+    thread = threading.Thread(target=_run, name=name, daemon=True)
+    thread.start()
+    return thread
+
+
+def _broadcast_env_change() -> None:
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        result = wintypes.DWORD()
+        ctypes.windll.user32.SendMessageTimeoutW(
+            _HWND_BROADCAST,
+            _WM_SETTINGCHANGE,
+            0,
+            "Environment",
+            _SMTO_ABORTIFHUNG,
+            1000,
+            ctypes.byref(result),
+        )
+    except Exception as exc:
+        _LOG.debug("WM_SETTINGCHANGE broadcast failed: %s", exc)
+
+
+def _persist_env_batch(values: dict[str, str], scope: str) -> None:
+    import winreg
+
+    if scope == "machine":
+        root, sub_key = winreg.HKEY_LOCAL_MACHINE, _MACHINE_ENV_KEY
+    else:
+        root, sub_key = winreg.HKEY_CURRENT_USER, _USER_ENV_KEY
+    with winreg.OpenKeyEx(root, sub_key, 0, winreg.KEY_SET_VALUE) as key:
+        for name, value in values.items():
+            value_type = winreg.REG_EXPAND_SZ if "%" in value else winreg.REG_SZ
+            winreg.SetValueEx(key, name, 0, value_type, value)
+    _broadcast_env_change()
+
+
+def _default_stdin_isatty() -> bool:
+    try:
+        return bool(getattr(sys, "stdin", None) and sys.stdin.isatty())
+    except Exception:
+        return False
+
+
 def persist_env_vars(vars_to_set: dict[str, str], prefer_machine: bool = True) -> str:
     if os.name != "nt":
         for key, value in vars_to_set.items():
@@ -17,41 +107,18 @@ def persist_env_vars(vars_to_set: dict[str, str], prefer_machine: bool = True) -
         return "process"
 
     scope = "machine" if prefer_machine else "user"
-    if prefer_machine:
-        try:
-            for key, value in vars_to_set.items():
-                subprocess.run(
-                    ["setx", "/M", key, value],
-                    check=True,
-                    shell=False,
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                )
-        except Exception:
+    try:
+        _persist_env_batch(vars_to_set, scope)
+    except Exception as exc:
+        if scope == "machine":
+            _LOG.debug("machine env persist failed, retrying user scope: %s", exc)
             scope = "user"
-            for key, value in vars_to_set.items():
-                try:
-                    subprocess.run(
-                        ["setx", key, value],
-                        check=True,
-                        shell=False,
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                    )
-                except Exception:
-                    pass
-    else:
-        for key, value in vars_to_set.items():
             try:
-                subprocess.run(
-                    ["setx", key, value],
-                    check=True,
-                    shell=False,
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                )
-            except Exception:
-                pass
+                _persist_env_batch(vars_to_set, scope)
+            except Exception as exc2:
+                _LOG.debug("user env persist failed: %s", exc2)
+        else:
+            _LOG.debug("user env persist failed: %s", exc)
 
     for key, value in vars_to_set.items():
         os.environ[key] = value
@@ -73,9 +140,7 @@ def ensure_guest_credentials_interactive(
         return "ok_env"
 
     if isatty_fn is None:
-        def _isatty_default() -> bool:
-            return bool(os.isatty(0))
-        isatty_fn = _isatty_default
+        isatty_fn = _default_stdin_isatty
     if input_fn is None:
         input_fn = input
     if getpass_fn is None:
@@ -120,21 +185,7 @@ def ensure_remote_api_env_interactive(
         return "ok_env"
 
     if isatty_fn is None:
-        import sys as _sys
-        def _stdin_isatty() -> bool:
-            try:
-                return bool(getattr(_sys, "stdin", None) and _sys.stdin.isatty())
-            except Exception:
-                return False
-        isatty_fn = _stdin_isatty
-    if isatty_fn is None:
-        import sys as _sys
-        def _stdin_isatty() -> bool:
-            try:
-                return bool(getattr(_sys, "stdin", None) and _sys.stdin.isatty())
-            except Exception:
-                return False
-        isatty_fn = _stdin_isatty
+        isatty_fn = _default_stdin_isatty
     if input_fn is None:
         input_fn = input
 
@@ -168,40 +219,40 @@ def ensure_remote_api_env_interactive(
             os.environ["REMOTE_VM_API_HOST"] = entered_host
             os.environ["REMOTE_VM_API_PORT"] = entered_port
         _LOG.info("API endpoint %s:%s stored to %s PATH env.", entered_host, entered_port, scope)
+        try:
+            from .errors import _build_env_hint
+
+            _build_env_hint.cache_clear()
+        except Exception:
+            pass
         return "ok_persisted"
 
     _LOG.warning("REMOTE_VM_API_HOST/REMOTE_VM_API_PORT 미설정이며, TTY가 없어 인터랙티브 입력이 불가합니다.")
     return "no_tty"
 
+@lru_cache(maxsize=512)
 def _normalize_path_entry(entry: str) -> str:
     entry = (entry or "").strip().strip('"').strip()
     try:
-        if os.name == "nt":
-            from ntpath import normcase, normpath
-
-            return normcase(normpath(entry))
-        else:
-            from posixpath import normpath
-
-            return normpath(entry)
+        return _normcase(_normpath(entry))
     except Exception:
         return entry
 
 
+def _normalized_path_set(path_value: str) -> frozenset[str]:
+    return frozenset(_normalize_path_entry(item) for item in (path_value or "").split(os.pathsep) if item)
+
+
 def _path_contains(path_value: str, target: str) -> bool:
-    norm_target = _normalize_path_entry(target)
-    for item in (path_value or "").split(os.pathsep):
-        if not item:
-            continue
-        if _normalize_path_entry(item) == norm_target:
-            return True
-    return False
+    return _normalize_path_entry(target) in _normalized_path_set(path_value)
 
 
-def _compute_new_path(path_value: str, to_add: str) -> str:
+def _compute_new_path(path_value: str, to_add: str, path_set: frozenset[str] | None = None) -> str:
     if not path_value:
         return to_add
-    if _path_contains(path_value, to_add):
+    if path_set is None:
+        path_set = _normalized_path_set(path_value)
+    if _normalize_path_entry(to_add) in path_set:
         return path_value
     return to_add + os.pathsep + path_value
 
@@ -212,10 +263,11 @@ def ensure_path_contains(dir_path: str, *, prefer_machine: bool = True) -> str:
         return "process" if os.name != "nt" else ("machine" if prefer_machine else "user")
 
     current = os.environ.get("PATH") or os.environ.get("Path") or ""
-    if _path_contains(current, dir_path):
+    path_set = _normalized_path_set(current)
+    if dir_path in path_set:
         return "process" if os.name != "nt" else ("machine" if prefer_machine else "user")
 
-    new_value = _compute_new_path(current, dir_path)
+    new_value = _compute_new_path(current, dir_path, path_set)
 
     if os.name != "nt":
         os.environ["PATH"] = new_value
@@ -223,23 +275,11 @@ def ensure_path_contains(dir_path: str, *, prefer_machine: bool = True) -> str:
 
     scope = "machine" if prefer_machine else "user"
     try:
-        subprocess.run(
-            ["setx", "/M", "PATH", new_value],
-            check=True,
-            shell=False,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
+        _persist_env_batch({"PATH": new_value}, scope)
     except Exception:
         scope = "user"
         try:
-            subprocess.run(
-                ["setx", "PATH", new_value],
-                check=True,
-                shell=False,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-            )
+            _persist_env_batch({"PATH": new_value}, scope)
         except Exception:
             os.environ["PATH"] = new_value
             return "process"
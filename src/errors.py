@@ -3,6 +3,7 @@ from __future__ import annotations
 import os
 import requests
 from enum import IntEnum
+from functools import lru_cache
 
 
 class ExitCode(IntEnum):
@@ -17,6 +18,7 @@ class ExitCode(IntEnum):
     REQUEST_ERROR = 12
 
 
+@lru_cache(maxsize=1)
 def _build_env_hint() -> str:
     msg = ""
     if not os.getenv("REMOTE_VM_API_HOST"):
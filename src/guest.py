@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import re
+import time
 from pathlib import Path
 import logging
 
@@ -10,6 +11,8 @@ from .vmrun import run_vmrun
 
 logger = logging.getLogger(__name__)
 
+_EXIT_RE = re.compile(r"exit code:\s*(\d+)")
+
 
 def run_in_guest(
     vmx: Path,
@@ -37,7 +40,7 @@ def run_in_guest(
             return
         except RuntimeError as exc:
             msg = str(exc)
-            m = re.search(r"exit code:\s*(\d+)", msg)
+            m = _EXIT_RE.search(msg) if "exit code:" in msg else None
             if m and int(m.group(1)) in success_codes:
                 return
             if attempt == retries:
@@ -49,6 +52,7 @@ def run_in_guest(
                     msg,
                 )
                 return
+            time.sleep(0.5 * 2 ** attempt)
 
 
 def run_in_guest_capture(
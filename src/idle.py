@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import atexit
 import logging
+import os
+import threading
 import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from operator import itemgetter
 from typing import Any, Dict
 
 from . import metrics
@@ -15,9 +19,12 @@ from .config import (
 	RDP_PORT,
     RDP_CHECK_CONCURRENCY,
     RDP_CHECK_BATCH_SIZE,
+    RDP_CHECK_BUDGET_SEC,
+    RDP_STATUS_CACHE_TTL_SEC,
+    VALIDATE_RUNNING_VMX_EXISTS,
 )
 from .models import IdlePolicy, IdleState
-from .vmrun import run_vmrun
+from .vmrun import invalidate_running_vms, list_running_vms, run_vmrun
 
 
 logger = logging.getLogger(__name__)
@@ -46,19 +53,50 @@ LAST_STATUS: Dict[str, Any] = {
 }
 
 
+_RDP_POOL: ThreadPoolExecutor | None = None
+_RDP_INFLIGHT: dict[str, Future] = {}
+_RDP_POOL_LOCK = threading.Lock()
+
+
+def _get_rdp_pool() -> ThreadPoolExecutor:
+	global _RDP_POOL
+	if _RDP_POOL is None:
+		with _RDP_POOL_LOCK:
+			if _RDP_POOL is None:
+				_RDP_POOL = ThreadPoolExecutor(max_workers=RDP_CHECK_CONCURRENCY, thread_name_prefix="rdpchk")
+				atexit.register(_RDP_POOL.shutdown, wait=False)
+	return _RDP_POOL
+
+
+def _filter_existing_vmx(paths: list[Path]) -> list[Path]:
+	listings: dict[Path, set[str]] = {}
+	existing: list[Path] = []
+	for p in paths:
+		names = listings.get(p.parent)
+		if names is None:
+			try:
+				with os.scandir(p.parent) as it:
+					names = {os.path.normcase(e.name) for e in it}
+			except OSError:
+				names = set()
+			listings[p.parent] = names
+		if os.path.normcase(p.name) in names:
+			existing.append(p)
+	return existing
+
+
 def _select_idle_vms_for_stop(candidates: list[Path], limit: int | None = None) -> list[Path]:
 	if not candidates:
 		return []
-	scored: list[tuple[float, Path]] = []
-	now = time.time()
+	scored: list[tuple[float, str, Path]] = []
 	for vmx in candidates:
 		key = str(vmx)
 		st = IDLE_DB.get(key)
 		last = st.last_active_ts if st and st.last_active_ts is not None else 0.0
-		scored.append((last, vmx))
-	scored.sort(key=lambda x: (x[0], str(x[1]).lower()))
+		scored.append((last, key.lower(), vmx))
+	scored.sort(key=itemgetter(0, 1))
 	max_to_stop = limit if limit is not None else MAX_SHUTDOWNS_PER_TICK
-	return [vmx for _, vmx in scored[: max(1, max_to_stop)]]
+	return [vmx for _, _, vmx in scored[: max(1, max_to_stop)]]
 
 
 def _is_pressure_high() -> tuple[bool, float, float]:
@@ -87,25 +125,28 @@ def _shutdown_vm(vmx: Path, mode: str = "soft") -> None:
 			run_vmrun(["stop", str(vmx), "soft"], timeout=60)
 	except Exception:
 		pass
+	invalidate_running_vms()
 
 
 def watchdog_tick(policy: IdlePolicy) -> None:
 	LAST_STATUS["last_error"] = None
 	LAST_STATUS["stopped_count"] = 0
 	LAST_STATUS["last_tick_at"] = time.time()
+	list_ttl = max(5, int(getattr(policy, "check_interval_sec", 0) or 0) // 2)
 	try:
-		running_raw = run_vmrun(["list"], timeout=10)
-		lines = [ln.strip() for ln in running_raw.splitlines() if ln.strip()]
 		vmx_list: list[Path] = []
-		for ln in lines[1:]:
+		for ln in list_running_vms(max_age=list_ttl):
 			p = Path(ln)
-			if p.suffix.lower() == ".vmx" and p.exists():
+			if p.suffix.lower() == ".vmx":
 				vmx_list.append(p)
+		if VALIDATE_RUNNING_VMX_EXISTS:
+			vmx_list = _filter_existing_vmx(vmx_list)
 	except Exception as exc:
 		LAST_STATUS["last_error"] = str(exc)
 		vmx_list = []
 
 	LAST_STATUS["vm_count"] = len(vmx_list)
+	vmx_keys: dict[Path, str] = {vmx: str(vmx) for vmx in vmx_list}
 
 	now = time.time()
 
@@ -122,43 +163,66 @@ def watchdog_tick(policy: IdlePolicy) -> None:
 	LAST_STATUS["mem_pressure"] = bool(float(LAST_STATUS["available_mem_gb"]) < float(MIN_AVAILABLE_MEM_GB))
 	LAST_STATUS["cpu_pressure"] = bool(float(LAST_STATUS["cpu_used_percent"]) >= float(CPU_PRESSURE_THRESHOLD_PCT))
 
+	relaxed = bool(getattr(policy, "only_on_pressure", False)) and not pressure
+
 	active_map: dict[Path, bool] = {}
+	pending: set[Path] = set()
 	if vmx_list:
 		if RDP_CHECK_BATCH_SIZE > 0:
 			vmx_targets = vmx_list[: RDP_CHECK_BATCH_SIZE]
 		else:
 			vmx_targets = vmx_list
-		from .network import has_active_rdp_connections_tcp as _tcp
+		from .network import has_active_rdp_connections_cached as _tcp
 		checker = _tcp
+		probe_ttl = RDP_STATUS_CACHE_TTL_SEC if relaxed else min(RDP_STATUS_CACHE_TTL_SEC, list_ttl)
 
 		if checker is not None:
-			max_workers = max(1, min(RDP_CHECK_CONCURRENCY, len(vmx_targets)))
-			with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rdpchk") as pool:
-				future_to_vmx = {pool.submit(checker, vmx, RDP_PORT): vmx for vmx in vmx_targets}
-				for fut in as_completed(future_to_vmx):
+			pool = _get_rdp_pool()
+			probe_timeout = RDP_CHECK_BUDGET_SEC or None
+			future_to_vmx: dict[Future, Path] = {}
+			for vmx in vmx_targets:
+				key = vmx_keys[vmx]
+				prev = _RDP_INFLIGHT.get(key)
+				if prev is not None and not prev.done():
+					continue
+				fut = pool.submit(checker, vmx, RDP_PORT, probe_ttl, probe_timeout)
+				_RDP_INFLIGHT[key] = fut
+				future_to_vmx[fut] = vmx
+			for key in [k for k, f in _RDP_INFLIGHT.items() if f.done()]:
+				del _RDP_INFLIGHT[key]
+			try:
+				for fut in as_completed(future_to_vmx, timeout=RDP_CHECK_BUDGET_SEC or None):
 					vmx = future_to_vmx[fut]
 					try:
 						active = bool(fut.result())
 					except Exception:
 						active = False
 					active_map[vmx] = active
-					key = str(vmx)
-					name = vmx.parent.name
 					if active:
-						IDLE_DB[key] = IdleState(vm=name, vmx=str(vmx), last_active_ts=now, shutting_down=False)
+						key = vmx_keys[vmx]
+						IDLE_DB[key] = IdleState(vm=vmx.parent.name, vmx=key, last_active_ts=now, shutting_down=False)
+			except FuturesTimeout:
+				for fut in future_to_vmx:
+					fut.cancel()
+				logger.info(
+					"watchdog: RDP checks exceeded %.1fs budget (%d/%d done)",
+					RDP_CHECK_BUDGET_SEC,
+					len(active_map),
+					len(future_to_vmx),
+				)
+			pending = {v for v in vmx_targets if v not in active_map}
 
 	victims_total = 0
 	for vmx in vmx_list:
-		name = vmx.parent.name
-		active = active_map.get(vmx, False)
-		key = str(vmx)
-		state = IDLE_DB.get(key)
+		active = None if vmx in pending else active_map.get(vmx, False)
 		if active:
-			IDLE_DB[key] = IdleState(vm=name, vmx=str(vmx), last_active_ts=now, shutting_down=False)
 			continue
-
+		key = vmx_keys[vmx]
+		state = IDLE_DB.get(key)
 		if state is None or state.last_active_ts is None:
-			IDLE_DB[key] = IdleState(vm=name, vmx=str(vmx), last_active_ts=now)
+			IDLE_DB[key] = IdleState(vm=vmx.parent.name, vmx=key, last_active_ts=now)
+			continue
+		if active is None:
 			continue
 
 		if not state.shutting_down:
@@ -168,12 +232,12 @@ def watchdog_tick(policy: IdlePolicy) -> None:
 				continue
 			if _LAST_CPU_OVER_LIMIT_COUNT < max(1, CPU_CONSECUTIVE_TICKS):
 				continue
-			candidates = [v for v in vmx_list if not active_map.get(v, False)]
+			candidates = [v for v in vmx_list if v not in pending and not active_map.get(v, False)]
 			per_tick_limit = 1 if pressure else None
 			to_stop = _select_idle_vms_for_stop(candidates, limit=per_tick_limit)
 			for victim in to_stop:
-				key2 = str(victim)
-				s2 = IDLE_DB.get(key2) or IdleState(vm=victim.parent.name, vmx=str(victim), last_active_ts=now)
+				key2 = vmx_keys[victim]
+				s2 = IDLE_DB.get(key2) or IdleState(vm=victim.parent.name, vmx=key2, last_active_ts=now)
 				IDLE_DB[key2] = IdleState(vm=s2.vm, vmx=s2.vmx, last_active_ts=s2.last_active_ts, shutting_down=True)
 				if pressure:
 					logger.warning(
@@ -209,6 +273,9 @@ def watchdog_tick(policy: IdlePolicy) -> None:
 		stop_reason = "pressure-only"
 
 	inst = bool(LAST_STATUS["mem_pressure"]) or bool(LAST_STATUS["cpu_pressure"])
+	level = logging.WARNING if victims_total > 0 or inst else logging.INFO
+	if not logger.isEnabledFor(level):
+		return
 	msg = (
 		f"watchdog: vms={LAST_STATUS['vm_count']} | mem_avail={LAST_STATUS['available_mem_gb']:.2f}GB | "
 		f"cpu_avail={LAST_STATUS['cpu_idle_percent']:.1f}% | "
@@ -216,7 +283,4 @@ def watchdog_tick(policy: IdlePolicy) -> None:
 		f"(mem={bool(LAST_STATUS['mem_pressure'])} cpu={bool(LAST_STATUS['cpu_pressure'])} "
 		f"ticks={LAST_STATUS['cpu_over_ticks']}/{LAST_STATUS['cpu_required_ticks']})"
 	)
-	if victims_total > 0 or inst:
-		logger.warning(msg)
-	else:
-		logger.info(msg)
+	logger.log(level, msg)
@@ -1,15 +1,82 @@
 from __future__ import annotations
 
 import ctypes
+from functools import wraps
 import os
-import subprocess
-import re
+import threading
+import time
+from typing import Callable
 
 import psutil
 
-from .config import CPU_SAMPLE_DURATION_SEC
+from .config import CPU_SAMPLE_DURATION_SEC, METRICS_CACHE_TTL_SEC
 
 
+_LAST: dict[str, tuple[float, float]] = {}
+_LAST_LOCK = threading.Lock()
+_PSUTIL_CPU_PRIMED = False
+_LAST_TIMES: tuple[int, int, int] | None = None
+
+
+def _cached(ttl: float) -> Callable[[Callable[[], float]], Callable[[], float]]:
+    def decorator(fn: Callable[[], float]) -> Callable[[], float]:
+        key = fn.__name__
+
+        @wraps(fn)
+        def wrapper() -> float:
+            now = time.monotonic()
+            with _LAST_LOCK:
+                hit = _LAST.get(key)
+            if hit is not None and now - hit[0] < ttl:
+                return hit[1]
+            value = fn()
+            with _LAST_LOCK:
+                _LAST[key] = (time.monotonic(), value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def _psutil_cpu_percent() -> float:
+    global _PSUTIL_CPU_PRIMED
+    if not _PSUTIL_CPU_PRIMED:
+        pct = float(psutil.cpu_percent(interval=CPU_SAMPLE_DURATION_SEC))
+        _PSUTIL_CPU_PRIMED = True
+        return pct
+    return float(psutil.cpu_percent(interval=None))
+
+
+def _read_system_times() -> tuple[int, int, int] | None:
+    idle = ctypes.c_uint64()
+    kernel = ctypes.c_uint64()
+    user = ctypes.c_uint64()
+    if not ctypes.windll.kernel32.GetSystemTimes(ctypes.byref(idle), ctypes.byref(kernel), ctypes.byref(user)):
+        return None
+    return idle.value, kernel.value, user.value
+
+
+def _system_times_cpu_percent() -> float | None:
+    global _LAST_TIMES
+    prev = _LAST_TIMES
+    if prev is None:
+        prev = _read_system_times()
+        if prev is None:
+            return None
+        time.sleep(CPU_SAMPLE_DURATION_SEC)
+    cur = _read_system_times()
+    if cur is None:
+        return None
+    _LAST_TIMES = cur
+    idle_delta = cur[0] - prev[0]
+    total_delta = (cur[1] - prev[1]) + (cur[2] - prev[2])
+    if total_delta <= 0:
+        return None
+    return max(0.0, min(100.0, (1.0 - idle_delta / total_delta) * 100.0))
+
+
+@_cached(METRICS_CACHE_TTL_SEC)
 def get_host_available_memory_gb() -> float:
     try:
         if os.name == "nt":
@@ -35,42 +102,18 @@ def get_host_available_memory_gb() -> float:
         return 9999.0
 
 
+@_cached(METRICS_CACHE_TTL_SEC)
 def get_host_cpu_percent() -> float:
     if os.name == "nt":
         try:
-            cmd = ["typeperf", "-sc", "1", r"\Processor(_Total)\% Processor Time"]
-            proc = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-            if proc.returncode == 0:
-                lines = [ln.strip() for ln in proc.stdout.splitlines() if ln.strip()]
-                if len(lines) >= 3:
-                    last = lines[-1]
-                    m = re.search(r"([0-9]+[\.,][0-9]+|[0-9]+)$", last)
-                    if m:
-                        val_str = m.group(1).replace(",", ".")
-                        return float(val_str)
-        except Exception:
-            pass
-
-        try:
-            ps_cmd = (
-                "($s=(Get-Counter '" + r"\Processor(_Total)\% Processor Time" + "' -SampleInterval 1 -MaxSamples 1).CounterSamples.CookedValue) | "
-                "Measure-Object -Average | ForEach-Object { [int][math]::Round($_.Average) }"
-            )
-            proc = subprocess.run([
-                r"C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe",
-                "-NoProfile",
-                "-Command",
-                ps_cmd,
-            ], capture_output=True, text=True, timeout=5)
-            if proc.returncode == 0:
-                out = proc.stdout.strip()
-                if out.isdigit():
-                    return float(int(out))
+            pct = _system_times_cpu_percent()
+            if pct is not None:
+                return pct
         except Exception:
             pass
 
     try:
-        pct = float(psutil.cpu_percent(interval=CPU_SAMPLE_DURATION_SEC))
+        pct = _psutil_cpu_percent()
         if pct >= 0.0:
             return pct
     except Exception:
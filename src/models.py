@@ -1,10 +1,15 @@
 from __future__ import annotations
 
-from pydantic import BaseModel, Field
+from dataclasses import dataclass
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List
 
 
-class SnapshotListResponse(BaseModel):
+class _FrozenModel(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+
+class SnapshotListResponse(_FrozenModel):
     vm: str
     snapshots: List[str] = Field(..., description="Snapshot names")
 
@@ -14,7 +19,7 @@ class RevertRequest(BaseModel):
     vm: str = "init"
 
 
-class RevertResponse(BaseModel):
+class RevertResponse(_FrozenModel):
     vm: str
     snapshot: str
     ip: str
@@ -24,12 +29,12 @@ class ConnectRequest(BaseModel):
     vm: str = "init"
 
 
-class ConnectResponse(BaseModel):
+class ConnectResponse(_FrozenModel):
     vm: str
     ip: str
 
 
-class ExpectedTimeResponse(BaseModel):
+class ExpectedTimeResponse(_FrozenModel):
     vm: str
     op: str
     avg_seconds: float | None
@@ -44,14 +49,14 @@ class TaskInfo(BaseModel):
     error: str | None = None
 
 
-class VMListItem(BaseModel):
+class VMListItem(_FrozenModel):
     name: str
     vmx: str
     clients: List[str] = Field(default_factory=list)
     active: bool = Field(default=False)
 
 
-class VMListResponse(BaseModel):
+class VMListResponse(_FrozenModel):
     root: str
     vms: List[VMListItem]
 
@@ -73,7 +78,8 @@ class ResourcePolicy(BaseModel):
     cpu_consecutive_ticks: int = Field(default=3, description="Consecutive ticks above threshold required to trigger CPU pressure")
 
 
-class IdleState(BaseModel):
+@dataclass(slots=True)
+class IdleState:
     vm: str
     vmx: str
     last_active_ts: float | None = None
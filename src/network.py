@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+from bisect import bisect_right
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import errno
+from functools import lru_cache
 import ipaddress
 from pathlib import Path
 import logging
+import os
 from typing import Callable
 import re
 
@@ -12,58 +17,90 @@ from .config import (
     RDP_PORT,
     RDP_PS_TIMEOUT_SEC,
     RDP_QUSER_TIMEOUT_SEC,
+    RDP_STATUS_CACHE_TTL_SEC,
     TCP_PROBE_TIMEOUT_SEC,
     ENABLE_TOOLS_SELF_HEAL,
+    GUEST_IP_CACHE_TTL_SEC,
     TOOLS_RESTART_COOLDOWN_SEC,
 )
 from .guest import run_in_guest, run_in_guest_capture
-from .vmrun import run_vmrun
+from .vmrun import cached_vmrun, invalidate_cached_vmrun, run_vmrun_bytes
+import select
 import socket
+import struct
+import threading
 import time
 import subprocess
 
 
 logger = logging.getLogger(__name__)
 
+_PROBE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rdpprobe")
+_CMD_EXE = r"C:\\Windows\\System32\\cmd.exe"
+_POWERSHELL = r"C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe"
+_RENEW_CMD = "ipconfig /release & ipconfig /renew & ipconfig /flushdns"
+_PS_REMOTE_IPS_TMPL = (
+    "$ips=(Get-NetTCPConnection -LocalPort {port} -State Established -ErrorAction SilentlyContinue | "
+    "Select-Object -ExpandProperty RemoteAddress | "
+    "ForEach-Object {{ try {{ ([IPAddress]$_).IPAddressToString }} catch {{}} }} | Sort-Object -Unique); "
+    "if($ips){{ $ips -join '\n' }}"
+)
+_NETSTAT_TMPL = 'netstat -ano | find "ESTABLISHED" | find ":{port}"'
+_QWINSTA = r"C:\\Windows\\System32\\qwinsta.exe"
+
+
+_LINGER_RESET = struct.pack("HH" if os.name == "nt" else "ii", 1, 0)
+_CONNECT_PENDING = frozenset(
+    {0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, "WSAEWOULDBLOCK", errno.EWOULDBLOCK)}
+)
+
 
 _ACTIVE_KEYWORDS = {" active ", "활성", "activo", "attivo", "aktív", "aktief", "active"}
+_ACTIVE_STATES = frozenset(k.strip().casefold() for k in _ACTIVE_KEYWORDS)
+_LINE_RE = re.compile(r"[^\r\n]+")
 
 
-def _line_has_active_keyword(text: str) -> bool:
-    low = f" {text.lower()} "
-    return any(k in low for k in _ACTIVE_KEYWORDS)
+def _pack_ranges(nets) -> tuple[list[int], list[int]]:
+    merged: list[list[int]] = []
+    for lo, hi in sorted((int(n.network_address), int(n.broadcast_address)) for n in nets if n.version == 4):
+        if merged and lo <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return [lo for lo, _ in merged], [hi for _, hi in merged]
 
 
-def _line_is_remote_session(text: str) -> bool:
-    low = text.lower()
-    if "console" in low:
-        return False
-    if "rdp-tcp" in low or "rdp" in low:
-        return True
-    return bool(re.search(r"\brdp[-]tcp#?\d*\b", low))
+_EXCLUDE_RANGES = _pack_ranges(EXCLUDE_SUBNETS)
+_PREFERRED_RANGES = _pack_ranges(PREFERRED_SUBNETS)
 
 
-def _has_remote_active_from_session_tools(output: str) -> bool:
-    if not output:
-        return False
-    for raw in output.splitlines():
-        line = raw.strip()
-        if not line:
-            continue
-        if line.lower().startswith("username"):
-            continue
-        if _line_is_remote_session(line) and _line_has_active_keyword(line):
-            return True
-    return False
+def _in_ranges(value: int, ranges: tuple[list[int], list[int]]) -> bool:
+    lows, highs = ranges
+    i = bisect_right(lows, value) - 1
+    return i >= 0 and value <= highs[i]
 
-def is_preferred_ip(ip_str: str) -> bool:
+
+@lru_cache(maxsize=4096)
+def classify_ip(ip_str: str) -> int:
     try:
-        ip_obj = ipaddress.ip_address(ip_str)
-    except ValueError:
-        return False
-    if any(ip_obj in net for net in EXCLUDE_SUBNETS):
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET, ip_str), "big")
+    except (OSError, TypeError, ValueError):
+        try:
+            ip_obj = ipaddress.ip_address(ip_str)
+        except ValueError:
+            return -1
+        if any(ip_obj in net for net in EXCLUDE_SUBNETS):
+            return -1
+        return 1 if any(ip_obj in net for net in PREFERRED_SUBNETS) else 0
+    if _in_ranges(value, _EXCLUDE_RANGES):
+        return -1
+    return 1 if _in_ranges(value, _PREFERRED_RANGES) else 0
+
+
+def is_preferred_ip(ip_str: str) -> bool:
+    if not PREFERRED_SUBNETS:
         return False
-    return any(ip_obj in net for net in PREFERRED_SUBNETS)
+    return classify_ip(ip_str) == 1
 
 
 _LAST_TOOLS_RESTART: dict[str, float] = {}
@@ -80,162 +117,240 @@ def _maybe_restart_vmware_tools(vmx: Path) -> None:
     try:
         run_in_guest(
             vmx,
-            r"C:\\Windows\\System32\\sc.exe",
-            "stop",
-            "VMTools",
-            timeout=30,
-        )
-    except Exception as exc:
-        logger.debug("VMTools stop failed: %s", exc)
-    try:
-        run_in_guest(
-            vmx,
-            r"C:\\Windows\\System32\\sc.exe",
-            "start",
-            "VMTools",
+            _POWERSHELL,
+            "-NoProfile",
+            "-Command",
+            "Restart-Service VMTools -Force",
             timeout=30,
+            retries=1,
         )
         _LAST_TOOLS_RESTART[key] = now
         logger.warning("Attempted VMware Tools restart inside guest: vmx=%s", vmx)
     except Exception as exc:
-        logger.debug("VMTools start failed: %s", exc)
+        logger.debug("VMTools restart failed: %s", exc)
 
 
-def has_active_rdp_connections_tcp(vmx: Path, rdp_port: int = RDP_PORT) -> bool:
+@lru_cache(maxsize=1024)
+def _ip_family(ip: str) -> int | None:
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, ip)
+            return family
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def tcp_probe(ip: str, port: int, timeout: float) -> bool:
+    family = _ip_family(ip)
+    if family is None:
+        return False
+    try:
+        sock = socket.socket(family, socket.SOCK_STREAM)
+    except OSError:
+        return False
+    ok = False
+    try:
+        sock.setblocking(False)
+        rc = sock.connect_ex((ip, port))
+        if rc not in _CONNECT_PENDING:
+            return False
+        if rc:
+            _, writable, _ = select.select([], [sock], [sock], timeout)
+            if not writable:
+                return False
+        ok = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+        return ok
+    except (OSError, ValueError):
+        return False
+    finally:
+        if not ok:
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RESET)
+            except OSError:
+                pass
+        sock.close()
+
+
+def has_active_rdp_connections_tcp(vmx: Path, rdp_port: int = RDP_PORT, timeout: float | None = None) -> bool:
+    deadline = None if timeout is None else time.monotonic() + timeout
     try:
-        ip_raw = run_vmrun(["getGuestIPAddress", str(vmx)], timeout=6)
+        ip_raw = cached_vmrun(
+            "getGuestIPAddress", vmx, GUEST_IP_CACHE_TTL_SEC, timeout=6 if timeout is None else min(6, timeout)
+        )
         ip = ip_raw.strip()
         if not ip:
             return False
     except Exception:
         return False
+    probe_timeout = TCP_PROBE_TIMEOUT_SEC
+    if deadline is not None:
+        probe_timeout = min(probe_timeout, deadline - time.monotonic())
+        if probe_timeout <= 0:
+            return False
+    return tcp_probe(ip, rdp_port, probe_timeout)
+
+
+_RDP_STATE_CACHE: dict[tuple[str, int], tuple[float, bool]] = {}
+_RDP_STATE_INFLIGHT: dict[tuple[str, int], Future] = {}
+_RDP_STATE_LOCK = threading.Lock()
+
+
+def has_active_rdp_connections_cached(
+    vmx: Path, rdp_port: int = RDP_PORT, ttl: float = RDP_STATUS_CACHE_TTL_SEC, timeout: float | None = None
+) -> bool:
+    key = (str(vmx), rdp_port)
+    with _RDP_STATE_LOCK:
+        hit = _RDP_STATE_CACHE.get(key)
+        if hit is not None and time.monotonic() - hit[0] < ttl:
+            return hit[1]
+        fut = _RDP_STATE_INFLIGHT.get(key)
+        owner = fut is None
+        if owner:
+            fut = Future()
+            _RDP_STATE_INFLIGHT[key] = fut
+    if not owner:
+        return fut.result(timeout=timeout)
     try:
-        with socket.create_connection((ip, rdp_port), timeout=TCP_PROBE_TIMEOUT_SEC):
-            return True
-    except Exception:
-        return False
+        result = has_active_rdp_connections_tcp(vmx, rdp_port, timeout)
+    except Exception as exc:
+        with _RDP_STATE_LOCK:
+            _RDP_STATE_INFLIGHT.pop(key, None)
+        fut.set_exception(exc)
+        raise
+    with _RDP_STATE_LOCK:
+        _RDP_STATE_CACHE[key] = (time.monotonic(), result)
+        _RDP_STATE_INFLIGHT.pop(key, None)
+    fut.set_result(result)
+    return result
+
+
+def invalidate_rdp_state(vmx: Path) -> None:
+    vmx_key = str(vmx)
+    with _RDP_STATE_LOCK:
+        for key in [k for k in _RDP_STATE_CACHE if k[0] == vmx_key]:
+            del _RDP_STATE_CACHE[key]
+    invalidate_cached_vmrun("getGuestIPAddress", vmx)
 
 
 def renew_network(vmx: Path, on_progress: Callable[[str], None] | None = None) -> None:
-    steps: list[tuple[str, list[str]]] = [
-        ("IP 해제", [r"C:\\Windows\\System32\\ipconfig.exe", "/release"]),
-        ("DHCP 갱신", [r"C:\\Windows\\System32\\ipconfig.exe", "/renew"]),
-        ("DNS 플러시", [r"C:\\Windows\\System32\\ipconfig.exe", "/flushdns"]),
-    ]
+    title = "IP 갱신"
 
     def log(msg: str) -> None:
         if on_progress:
             on_progress(msg)
 
     log("네트워크 재협상 시작")
-    for title, cmd in steps:
-        log(f"{title} 실행 중…")
-        try:
-            run_in_guest(vmx, cmd[0], *cmd[1:], timeout=60, retries=2, success_codes={0, 1})
-            log(f"{title} 완료")
-        except Exception as exc:
-            log(f"{title} 실패: {exc}")
-    log("네트워크 재협상 종료")
-
-
-def get_active_rdp_remote_ips(vmx: Path, rdp_port: int = RDP_PORT) -> list[str]:
     try:
-        ps_cmd = (
-            f"$ips=(Get-NetTCPConnection -LocalPort {rdp_port} -State Established -ErrorAction SilentlyContinue | "
-            "Select-Object -ExpandProperty RemoteAddress | Sort-Object -Unique); "
-            "if($ips){ $ips -join '\n' }"
-        )
-        out = run_in_guest_capture(
-            vmx,
-            r"C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe",
-            "-NoProfile",
-            "-Command",
-            ps_cmd,
-            timeout=RDP_PS_TIMEOUT_SEC,
-        )
-        if out:
-            ips = [ln.strip() for ln in out.splitlines() if ln.strip()]
-            cleaned: list[str] = []
-            for ip in ips:
-                try:
-                    ip_clean = ip.split("%", 1)[0]
-                    ipaddress.ip_address(ip_clean)
-                    cleaned.append(ip_clean)
-                except Exception:
-                    pass
-            if cleaned:
-                return list(dict.fromkeys(cleaned))
-    except Exception as exc:
-        logger.debug("PS get_active_rdp_remote_ips failed: %s", exc)
-
+        tools_state = run_vmrun_bytes(["checkToolsState", str(vmx)], timeout=5)
+    except Exception:
+        tools_state = b""
+    if tools_state and tools_state.strip().lower() != b"running":
+        log(f"{title} 건너뜀: VMware Tools 미실행({tools_state.decode('utf-8', 'replace')})")
+        log("네트워크 재협상 종료")
+        return
+    log(f"{title} 실행 중…")
     try:
-        ns_out = run_in_guest_capture(
+        run_in_guest(
             vmx,
-            r"C:\\Windows\\System32\\cmd.exe",
+            _CMD_EXE,
             "/c",
-            f"netstat -ano | find \"ESTABLISHED\" | find \":{rdp_port}\"",
-            timeout=RDP_QUSER_TIMEOUT_SEC,
+            _RENEW_CMD,
+            timeout=120,
+            retries=2,
+            success_codes={0, 1},
         )
+        log(f"{title} 완료")
     except Exception as exc:
-        logger.debug("netstat get_active_rdp_remote_ips failed: %s", exc)
-        ns_out = ""
-
-    if ns_out:
-        remotes: list[str] = []
-        for line in ns_out.splitlines():
-            parts = [p for p in line.split() if p]
-            if len(parts) >= 3:
-                remote = parts[2]
-                try:
-                    if remote.startswith("[") and "]" in remote:
-                        host = remote[1:].split("]", 1)[0]
-                    else:
-                        host = remote.rsplit(":", 1)[0]
-                    host = host.split("%", 1)[0]
-                    ipaddress.ip_address(host)
-                    remotes.append(host)
-                except Exception:
-                    continue
-        if remotes:
-            return list(dict.fromkeys(remotes))
+        log(f"{title} 실패: {exc}")
+    log("네트워크 재협상 종료")
+
+
+@lru_cache(maxsize=8)
+def _ps_remote_ips_argv(port: int) -> tuple[str, ...]:
+    return (_POWERSHELL, "-NoProfile", "-Command", _PS_REMOTE_IPS_TMPL.format(port=port))
+
+
+@lru_cache(maxsize=8)
+def _netstat_argv(port: int) -> tuple[str, ...]:
+    return (_CMD_EXE, "/c", _NETSTAT_TMPL.format(port=port))
+
+
+def _remote_ips_via_ps(vmx: Path, rdp_port: int) -> list[str]:
+    out = run_in_guest_capture(vmx, *_ps_remote_ips_argv(rdp_port), timeout=RDP_PS_TIMEOUT_SEC)
+    if not out:
+        return []
+    cleaned: list[str] = []
+    for m in _LINE_RE.finditer(out):
+        ip = m.group().strip().split("%", 1)[0]
+        if ip and _ip_family(ip) is not None:
+            cleaned.append(ip)
+    return list(dict.fromkeys(cleaned))
+
+
+def _remote_ips_via_netstat(vmx: Path, rdp_port: int) -> list[str]:
+    ns_out = run_in_guest_capture(vmx, *_netstat_argv(rdp_port), timeout=RDP_QUSER_TIMEOUT_SEC)
+    if not ns_out:
+        return []
+    remotes: list[str] = []
+    for m in _LINE_RE.finditer(ns_out):
+        parts = m.group().split()
+        if len(parts) >= 3:
+            remote = parts[2]
+            if remote.startswith("[") and "]" in remote:
+                host = remote[1:].split("]", 1)[0]
+            else:
+                host = remote.rsplit(":", 1)[0]
+            host = host.split("%", 1)[0]
+            if _ip_family(host) is not None:
+                remotes.append(host)
+    return list(dict.fromkeys(remotes))
+
 
+def get_active_rdp_remote_ips(vmx: Path, rdp_port: int = RDP_PORT) -> list[str]:
+    futures = {
+        _PROBE_POOL.submit(_remote_ips_via_ps, vmx, rdp_port): "PS",
+        _PROBE_POOL.submit(_remote_ips_via_netstat, vmx, rdp_port): "netstat",
+    }
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            try:
+                ips = fut.result()
+            except Exception as exc:
+                logger.debug("%s get_active_rdp_remote_ips failed: %s", futures[fut], exc)
+                continue
+            if ips:
+                for other in pending:
+                    other.cancel()
+                return ips
     return []
 
 
-def get_active_rdp_usernames(vmx: Path) -> list[str]:
-    outputs: list[str] = []
-    try:
-        out = run_in_guest_capture(vmx, r"C:\\Windows\\System32\\query.exe", "user", timeout=RDP_QUSER_TIMEOUT_SEC)
-        if out:
-            outputs.append(out)
-    except Exception as exc:
-        logger.debug("query user for usernames failed: %s", exc)
-    try:
-        out2 = run_in_guest_capture(vmx, r"C:\\Windows\\System32\\quser.exe", timeout=RDP_QUSER_TIMEOUT_SEC)
-        if out2:
-            outputs.append(out2)
-    except Exception as exc:
-        logger.debug("quser for usernames failed: %s", exc)
+def _qwinsta_active_rdp_users(out: str) -> list[str]:
     usernames: list[str] = []
-    for out in outputs:
-        for raw in out.splitlines():
-            line = raw.strip()
-            if not line or line.lower().startswith("username"):
-                continue
-            if not (_line_is_remote_session(line) and _line_has_active_keyword(line)):
-                continue
-            token_line = line.lstrip(">").strip()
-            first = token_line.split()
-            if first:
-                name = first[0]
-                if name and name.lower() != "username" and name not in usernames:
-                    usernames.append(name)
+    for m in _LINE_RE.finditer(out):
+        tokens = m.group().lstrip(" >").split()
+        if not tokens or not tokens[0].lower().startswith("rdp-tcp#"):
+            continue
+        id_idx = next((i for i in range(1, len(tokens)) if tokens[i].isdigit()), None)
+        if id_idx is None or id_idx + 1 >= len(tokens):
+            continue
+        name = " ".join(tokens[1:id_idx])
+        if name and tokens[id_idx + 1].casefold() in _ACTIVE_STATES and name not in usernames:
+            usernames.append(name)
     return usernames
 
 
+def get_active_rdp_usernames(vmx: Path) -> list[str]:
+    out = run_in_guest_capture(vmx, _QWINSTA, timeout=RDP_QUSER_TIMEOUT_SEC)
+    return _qwinsta_active_rdp_users(out) if out else []
+
+
 def _get_guest_ip_quick(vmx: Path) -> str:
     try:
-        ip_raw = run_vmrun(["getGuestIPAddress", str(vmx)], timeout=3)
+        ip_raw = cached_vmrun("getGuestIPAddress", vmx, GUEST_IP_CACHE_TTL_SEC, timeout=3)
         return (ip_raw or "").strip()
     except Exception:
         return ""
@@ -244,43 +359,19 @@ def _get_guest_ip_quick(vmx: Path) -> str:
 def get_active_rdp_usernames_host(ip: str) -> list[str]:
     if not ip:
         return []
-    commands = [
-        [r"C:\\Windows\\System32\\query.exe", "user", f"/server:{ip}"],
-        [r"C:\\Windows\\System32\\quser.exe", f"/server:{ip}"],
-        [r"C:\\Windows\\System32\\qwinsta.exe", f"/server:{ip}"],
-    ]
-    outputs: list[str] = []
-    for cmd in commands:
-        try:
-            try:
-                if str(cmd[0]).lower().endswith("query.exe"):
-                    logger.debug("host query.exe cmd: %s", " ".join(cmd))
-            except Exception:
-                pass
-            cp = subprocess.run(cmd, capture_output=True, text=True, timeout=2)
-            out = (cp.stdout or "").strip()
-            if out:
-                outputs.append(out)
-        except Exception as exc:
-            logger.debug("host-side session probe failed: %s cmd=%s", exc, cmd)
-    users: list[str] = []
-    for out in outputs:
-        for raw in out.splitlines():
-            line = raw.strip()
-            if not line or line.lower().startswith("username"):
-                continue
-            if not (_line_is_remote_session(line) and _line_has_active_keyword(line)):
-                continue
-            token_line = line.lstrip(">").strip()
-            parts = token_line.split()
-            if parts:
-                name = parts[0]
-                if name and name.lower() != "username" and name not in users:
-                    users.append(name)
-    return users
+    cmd = [_QWINSTA, f"/server:{ip}"]
+    try:
+        cp = subprocess.run(cmd, capture_output=True, text=True, timeout=2)
+    except Exception as exc:
+        logger.debug("host-side session probe failed: %s cmd=%s", exc, cmd)
+        return []
+    out = (cp.stdout or "").strip()
+    return _qwinsta_active_rdp_users(out) if out else []
 
 
 def get_active_rdp_usernames_best(vmx: Path) -> list[str]:
+    if not has_active_rdp_connections_cached(vmx):
+        return []
     users = get_active_rdp_usernames(vmx)
     if users:
         return users
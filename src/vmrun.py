@@ -1,22 +1,34 @@
 from __future__ import annotations
 
+from collections import OrderedDict
+from pathlib import Path
 import subprocess
+import threading
+import time
 from typing import Iterable
 
-from .config import VMRUN
+from .config import VMRUN, VMRUN_MAX_CONCURRENCY
 
 
-def run_vmrun(args: Iterable[str], capture: bool = True, timeout: int = 120) -> str:
+_VMRUN_SEM = threading.BoundedSemaphore(VMRUN_MAX_CONCURRENCY)
+
+
+def _run_vmrun(args: Iterable[str], capture: bool, timeout: float, encoding: str | None):
     cmd = [str(VMRUN), "-T", "ws", *args]
+    started = time.monotonic()
+    if not _VMRUN_SEM.acquire(timeout=timeout):
+        return "" if encoding else b""
     try:
-        completed = subprocess.run(
-            cmd,
-            capture_output=capture,
-            text=True,
-            check=True,
-            encoding="utf-8",
-            timeout=timeout,
-        )
+        try:
+            completed = subprocess.run(
+                cmd,
+                capture_output=capture,
+                check=True,
+                encoding=encoding,
+                timeout=max(0.1, timeout - (time.monotonic() - started)),
+            )
+        finally:
+            _VMRUN_SEM.release()
         return completed.stdout.strip()
     except subprocess.TimeoutExpired as exc:
         try:
@@ -24,6 +36,63 @@ def run_vmrun(args: Iterable[str], capture: bool = True, timeout: int = 120) ->
                 exc.process.kill()
         except Exception:
             pass
-        return ""
+        return "" if encoding else b""
     except subprocess.CalledProcessError as exc:
-        raise RuntimeError(f"vmrun failed: {exc.stderr.strip()}") from exc
+        stderr = exc.stderr if encoding else (exc.stderr or b"").decode("utf-8", "replace")
+        raise RuntimeError(f"vmrun failed: {stderr.strip()}") from exc
+
+
+def run_vmrun(args: Iterable[str], capture: bool = True, timeout: int = 120) -> str:
+    return _run_vmrun(args, capture, timeout, "utf-8")
+
+
+def run_vmrun_bytes(args: Iterable[str], timeout: int = 120) -> bytes:
+    return _run_vmrun(args, True, timeout, None)
+
+
+_RUNNING_CACHE: tuple[float, list[str]] | None = None
+
+
+def list_running_vms(max_age: float = 0.0) -> list[str]:
+    global _RUNNING_CACHE
+    cached = _RUNNING_CACHE
+    if cached is not None and max_age > 0 and time.monotonic() - cached[0] < max_age:
+        return list(cached[1])
+    raw = run_vmrun(["list"], timeout=10)
+    lines = [ln.strip() for ln in raw.splitlines() if ln.strip()]
+    paths = lines[1:]
+    if lines:
+        _RUNNING_CACHE = (time.monotonic(), paths)
+    return list(paths)
+
+
+def invalidate_running_vms() -> None:
+    global _RUNNING_CACHE
+    _RUNNING_CACHE = None
+
+
+_VMRUN_CACHE: OrderedDict[tuple[str, str], tuple[float, str]] = OrderedDict()
+_VMRUN_CACHE_LOCK = threading.Lock()
+_VMRUN_CACHE_MAX = 256
+
+
+def cached_vmrun(op: str, vmx: Path, ttl: float, timeout: float = 10) -> str:
+    key = (op, str(vmx))
+    now = time.monotonic()
+    with _VMRUN_CACHE_LOCK:
+        hit = _VMRUN_CACHE.get(key)
+        if hit is not None and now - hit[0] < ttl:
+            _VMRUN_CACHE.move_to_end(key)
+            return hit[1]
+    out = run_vmrun([op, str(vmx)], timeout=timeout)
+    with _VMRUN_CACHE_LOCK:
+        _VMRUN_CACHE[key] = (time.monotonic(), out)
+        _VMRUN_CACHE.move_to_end(key)
+        while len(_VMRUN_CACHE) > _VMRUN_CACHE_MAX:
+            _VMRUN_CACHE.popitem(last=False)
+    return out
+
+
+def invalidate_cached_vmrun(op: str, vmx: Path) -> None:
+    with _VMRUN_CACHE_LOCK:
+        _VMRUN_CACHE.pop((op, str(vmx)), None)
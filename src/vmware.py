@@ -1,18 +1,21 @@
 from __future__ import annotations
 
+import ctypes
+import os
 import re
+import socket
 import subprocess
 import time
 import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import Callable
-import socket
+from typing import Callable, Iterable
 import psutil
-import ipaddress
 
 from .config import (
-    GUEST_PASS,
-    GUEST_USER,
+    ADAPTIVE_POLL,
+    ADAPTIVE_POLL_BACKOFF,
+    ADAPTIVE_POLL_MAX_INTERVAL_SEC,
     IP_POLL_INTERVAL,
     IP_POLL_TIMEOUT,
     VMRUN,
@@ -20,79 +23,43 @@ from .config import (
     SKIP_TOOLS_WAIT_WHEN_HEADLESS,
     DHCP_LEASES_PATHS_RAW,
     PREFERRED_SUBNETS,
-    EXCLUDE_SUBNETS,
     RDP_PORT,
     RDP_READY_WAIT_SEC,
     RDP_READY_PROBE_INTERVAL_SEC,
 )
-from .network import renew_network
-from .vmrun import run_vmrun
+from .network import classify_ip, invalidate_rdp_state, renew_network, tcp_probe
+from .vmrun import invalidate_running_vms, list_running_vms, run_vmrun, run_vmrun_bytes
 
 
-def run_in_guest(
-    vmx: Path,
-    program: str,
-    *args: str,
-    timeout: int = 60,
-    retries: int = 3,
-    success_codes: set[int] | None = None,
-) -> None:
-    cmd_base = [
-        "-gu",
-        GUEST_USER,
-        "-gp",
-        GUEST_PASS,
-        "runProgramInGuest",
-        str(vmx),
-        program,
-        *args,
-    ]
-    if success_codes is None:
-        success_codes = {0}
-    for attempt in range(1, retries + 1):
-        try:
-            run_vmrun(cmd_base, capture=True, timeout=timeout)
-            return
-        except RuntimeError as exc:
-            msg = str(exc)
-            m = re.search(r"exit code:\s*(\d+)", msg)
-            if m:
-                exit_code = int(m.group(1))
-                if exit_code in success_codes:
-                    return
-            if attempt == retries:
-                return
-            time.sleep(2)
-
-
-def run_in_guest_capture(
-    vmx: Path,
-    program: str,
-    *args: str,
-    timeout: int = 30,
-) -> str:
-    cmd_base = [
-        "-gu",
-        GUEST_USER,
-        "-gp",
-        GUEST_PASS,
-        "runProgramInGuest",
-        str(vmx),
-        program,
-        *args,
-    ]
-    try:
-        return run_vmrun(cmd_base, capture=True, timeout=timeout)
-    except Exception:
-        return ""
+_ETH_PRESENT_RE = re.compile(r"ethernet(\d+)\.present\s*=\s*\"(true|TRUE)\"")
+_ETH_ADDR_RE = re.compile(r"ethernet(\d+)\.address\s*=\s*\"([0-9A-Fa-f:\-]{17})\"")
+_ETH_GEN_RE = re.compile(r"ethernet(\d+)\.generatedAddress\s*=\s*\"([0-9A-Fa-f:\-]{17})\"")
+_ARP_TYPES = frozenset({"dynamic", "static"})
+_ICMP_PAYLOAD = b"qa-vm-api"
+_ICMP_REPLY_SIZE = 128 + len(_ICMP_PAYLOAD)
+_TH32CS_SNAPPROCESS = 0x00000002
+_HEADLESS_TTL_SEC = 2.0
+_HEADLESS_CACHE: tuple[float, bool] | None = None
+_VMX_MAC_CACHE: dict[str, tuple[int, str]] = {}
+_LEASE_CACHE: dict[str, tuple[int, dict[str, str]]] = {}
+
+
+def _poll_delay(base: float, attempt: int) -> float:
+    if not ADAPTIVE_POLL:
+        return base
+    return min(max(base, ADAPTIVE_POLL_MAX_INTERVAL_SEC), base * ADAPTIVE_POLL_BACKOFF ** min(attempt, 32))
+
+
+def _path_key(path: str | Path) -> str:
+    return os.path.normcase(os.path.normpath(str(path)))
 
 
 def is_vm_running(vmx: Path) -> bool:
     try:
-        status = run_vmrun(["list"], timeout=10)
-        return str(vmx) in status
+        running = {_path_key(p) for p in list_running_vms(max_age=0.5)}
     except Exception:
         return False
+    return _path_key(vmx) in running
 
 
 def list_snapshots(vmx: Path) -> list[str]:
@@ -110,13 +77,15 @@ def start_vm_async(vmx: Path) -> None:
             )
         except Exception:
             pass
+    invalidate_running_vms()
+    invalidate_rdp_state(vmx)
     threading.Thread(target=run_start_command, daemon=True).start()
 
 
 def tools_ready(vmx: Path) -> bool:
     try:
-        state = run_vmrun(["checkToolsState", str(vmx)], timeout=10)
-        return "running" in state.lower()
+        state = run_vmrun_bytes(["checkToolsState", str(vmx)], timeout=10)
+        return state.strip().lower() == b"running"
     except Exception:
         return False
 
@@ -129,6 +98,7 @@ def wait_for_tools_ready(
         if on_progress:
             on_progress("헤드리스 감지 – Tools 대기 건너뜀")
         return
+    attempt = 0
     while True:
         if tools_ready(vmx):
             if on_progress:
@@ -136,7 +106,8 @@ def wait_for_tools_ready(
             return
         if time.perf_counter() - start > timeout:
             raise TimeoutError("VMware Tools 준비 타임아웃")
-        time.sleep(probe_interval)
+        time.sleep(_poll_delay(probe_interval, attempt))
+        attempt += 1
 
 
 def fast_wait_for_ip(
@@ -147,13 +118,14 @@ def fast_wait_for_ip(
 ) -> str:
     start_time = time.perf_counter()
     last_ip = ""
+    attempt = 0
     while True:
         if int(time.perf_counter() - start_time) > timeout:
             raise TimeoutError("fast_wait_for_ip: 시간 초과")
         try:
             raw = run_vmrun(["getGuestIPAddress", str(vmx)], capture=True, timeout=10)
             ip = raw.strip()
-            if re.fullmatch(r"\d+\.\d+\.\d+\.\d+", ip):
+            if _looks_like_ipv4(ip):
                 if on_progress and ip != last_ip:
                     on_progress(f"IP 확인: {ip}")
                     last_ip = ip
@@ -167,7 +139,57 @@ def fast_wait_for_ip(
                     on_progress(f"헤드리스: DHCP/ARP에서 IP 확인: {ip2}")
                     last_ip = ip2
                 return ip2
-        time.sleep(probe_interval)
+        time.sleep(_poll_delay(probe_interval, attempt))
+        attempt += 1
+
+
+def _icmp_echo_ok(host: str, timeout_ms: int) -> bool | None:
+    iphlpapi = ctypes.windll.iphlpapi
+    iphlpapi.IcmpCreateFile.restype = ctypes.c_void_p
+    iphlpapi.IcmpSendEcho.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_uint32,
+        ctypes.c_char_p,
+        ctypes.c_ushort,
+        ctypes.c_void_p,
+        ctypes.c_void_p,
+        ctypes.c_uint32,
+        ctypes.c_uint32,
+    ]
+    iphlpapi.IcmpCloseHandle.argtypes = [ctypes.c_void_p]
+    handle = iphlpapi.IcmpCreateFile()
+    if not handle or handle == ctypes.c_void_p(-1).value:
+        return None
+    try:
+        reply = ctypes.create_string_buffer(_ICMP_REPLY_SIZE)
+        count = iphlpapi.IcmpSendEcho(
+            handle,
+            int.from_bytes(socket.inet_aton(host), "little"),
+            _ICMP_PAYLOAD,
+            len(_ICMP_PAYLOAD),
+            None,
+            reply,
+            _ICMP_REPLY_SIZE,
+            timeout_ms,
+        )
+        return count > 0 and int.from_bytes(reply.raw[4:8], "little") == 0
+    finally:
+        iphlpapi.IcmpCloseHandle(handle)
+
+
+def _ping_ok(host: str) -> bool:
+    if os.name == "nt":
+        try:
+            ok = _icmp_echo_ok(host, 600)
+            if ok is not None:
+                return ok
+        except Exception:
+            pass
+    try:
+        res = subprocess.run(["ping", "-n", "1", "-w", "600", host], capture_output=True, text=True, timeout=2)
+        return "TTL=" in res.stdout
+    except Exception:
+        return False
 
 
 def wait_for_vm_ready(
@@ -181,22 +203,16 @@ def wait_for_vm_ready(
     if probe_interval is None:
         probe_interval = IP_POLL_INTERVAL
 
-    def _ping_ok(host: str) -> bool:
-        try:
-            res = subprocess.run(["ping", "-n", "1", "-w", "600", host], capture_output=True, text=True, timeout=2)
-            return "TTL=" in res.stdout
-        except Exception:
-            return False
-
     start_time = time.perf_counter()
     last_ip = ""
+    attempt = 0
     while True:
         if int(time.perf_counter() - start_time) > timeout:
             raise TimeoutError(f"{timeout}초 내에 유효한 IP를 확인하지 못했습니다")
         try:
             ip_raw = run_vmrun(["getGuestIPAddress", str(vmx)], capture=True, timeout=10)
             ip = ip_raw.strip()
-            if re.fullmatch(r"\d+\.\d+\.\d+\.\d+", ip):
+            if _looks_like_ipv4(ip):
                 if on_progress and ip != last_ip:
                     on_progress(f"IP 취득 중: {ip}")
                     last_ip = ip
@@ -204,6 +220,7 @@ def wait_for_vm_ready(
                     if on_progress:
                         on_progress("핑 응답 없음 – 네트워크 재협상")
                     renew_network(vmx, on_progress=on_progress)
+                    attempt = 0
                     continue
                 if on_progress:
                     on_progress("IP 검증 완료!")
@@ -217,7 +234,8 @@ def wait_for_vm_ready(
                     on_progress(f"헤드리스: DHCP/ARP에서 IP 확인: {ip2}")
                     last_ip = ip2
                 return ip2
-        time.sleep(probe_interval)
+        time.sleep(_poll_delay(probe_interval, attempt))
+        attempt += 1
 
 
 def wait_for_rdp_ready(
@@ -232,6 +250,7 @@ def wait_for_rdp_ready(
     tout = timeout if isinstance(timeout, (int, float)) and timeout else RDP_READY_WAIT_SEC
     interval = probe_interval if isinstance(probe_interval, (int, float)) and probe_interval else RDP_READY_PROBE_INTERVAL_SEC
     start = time.perf_counter()
+    attempt = 0
     while True:
         try:
             try:
@@ -239,10 +258,11 @@ def wait_for_rdp_ready(
                     if on_progress:
                         on_progress("VM 전원 꺼짐 감지 – 전원 켜는 중")
                     start_vm_async(vmx)
+                    attempt = 0
                     time.sleep(min(2.0, interval))
             except Exception:
                 pass
-            with socket.create_connection((ip, p), timeout=1.0):
+            if tcp_probe(ip, p, 1.0):
                 if on_progress:
                     on_progress("RDP 포트 준비 완료")
                 return True
@@ -252,18 +272,69 @@ def wait_for_rdp_ready(
             return False
         if on_progress:
             on_progress("RDP 대기 중…")
-        time.sleep(interval)
+        time.sleep(_poll_delay(interval, attempt))
+        attempt += 1
+
+
+class _PROCESSENTRY32W(ctypes.Structure):
+    _fields_ = [
+        ("dwSize", ctypes.c_uint32),
+        ("cntUsage", ctypes.c_uint32),
+        ("th32ProcessID", ctypes.c_uint32),
+        ("th32DefaultHeapID", ctypes.c_size_t),
+        ("th32ModuleID", ctypes.c_uint32),
+        ("cntThreads", ctypes.c_uint32),
+        ("th32ParentProcessID", ctypes.c_uint32),
+        ("pcPriClassBase", ctypes.c_long),
+        ("dwFlags", ctypes.c_uint32),
+        ("szExeFile", ctypes.c_wchar * 260),
+    ]
 
 
-def _is_headless() -> bool:
+def _vmware_ui_running_toolhelp() -> bool | None:
+    kernel32 = ctypes.windll.kernel32
+    entry_ptr = ctypes.POINTER(_PROCESSENTRY32W)
+    kernel32.CreateToolhelp32Snapshot.restype = ctypes.c_void_p
+    kernel32.Process32FirstW.argtypes = [ctypes.c_void_p, entry_ptr]
+    kernel32.Process32NextW.argtypes = [ctypes.c_void_p, entry_ptr]
+    kernel32.CloseHandle.argtypes = [ctypes.c_void_p]
+    snap = kernel32.CreateToolhelp32Snapshot(_TH32CS_SNAPPROCESS, 0)
+    if not snap or snap == ctypes.c_void_p(-1).value:
+        return None
     try:
-        for proc in psutil.process_iter(["name"]):
-            name = (proc.info.get("name") or "").lower()
-            if name == "vmware.exe":
-                return False
-    except Exception:
+        entry = _PROCESSENTRY32W()
+        entry.dwSize = ctypes.sizeof(_PROCESSENTRY32W)
+        ok = kernel32.Process32FirstW(snap, ctypes.byref(entry))
+        while ok:
+            if entry.szExeFile.lower() == "vmware.exe":
+                return True
+            ok = kernel32.Process32NextW(snap, ctypes.byref(entry))
         return False
-    return True
+    finally:
+        kernel32.CloseHandle(snap)
+
+
+def _is_headless() -> bool:
+    global _HEADLESS_CACHE
+    now = time.monotonic()
+    cached = _HEADLESS_CACHE
+    if cached is not None and now - cached[0] < _HEADLESS_TTL_SEC:
+        return cached[1]
+    ui_running = None
+    if os.name == "nt":
+        try:
+            ui_running = _vmware_ui_running_toolhelp()
+        except Exception:
+            ui_running = None
+    if ui_running is None:
+        try:
+            ui_running = any(
+                (proc.info.get("name") or "").lower() == "vmware.exe" for proc in psutil.process_iter(["name"])
+            )
+        except Exception:
+            ui_running = True
+    _HEADLESS_CACHE = (now, not ui_running)
+    return not ui_running
 
 
 def _normalize_mac_colon(mac: str) -> str:
@@ -274,28 +345,41 @@ def _normalize_mac_colon(mac: str) -> str:
 
 
 def _vmx_primary_mac(vmx: Path) -> str:
-    try:
-        text = vmx.read_text(encoding="utf-8", errors="ignore")
-    except Exception:
-        return ""
+    key = str(vmx)
     address = None
     generated = None
     present_nics: set[str] = set()
-    for line in text.splitlines():
-        ln = line.strip()
-        m_present = re.match(r"ethernet(\d+)\.present\s*=\s*\"(true|TRUE)\"", ln)
-        if m_present:
-            present_nics.add(m_present.group(1))
-        m_addr = re.match(r"ethernet(\d+)\.address\s*=\s*\"([0-9A-Fa-f:\-]{17})\"", ln)
-        if m_addr and (m_addr.group(1) in present_nics or address is None):
-            address = _normalize_mac_colon(m_addr.group(2))
-        m_gen = re.match(r"ethernet(\d+)\.generatedAddress\s*=\s*\"([0-9A-Fa-f:\-]{17})\"", ln)
-        if m_gen and (m_gen.group(1) in present_nics or generated is None):
-            generated = _normalize_mac_colon(m_gen.group(2))
-    return address or generated or ""
-
-
-def _dhcp_candidate_paths() -> list[Path]:
+    try:
+        mtime = vmx.stat().st_mtime_ns
+        hit = _VMX_MAC_CACHE.get(key)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+        with vmx.open("r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                ln = line.strip()
+                if not ln.startswith("ethernet"):
+                    continue
+                m_present = _ETH_PRESENT_RE.match(ln)
+                if m_present:
+                    present_nics.add(m_present.group(1))
+                    continue
+                m_addr = _ETH_ADDR_RE.match(ln)
+                if m_addr:
+                    if m_addr.group(1) in present_nics or address is None:
+                        address = _normalize_mac_colon(m_addr.group(2))
+                    continue
+                m_gen = _ETH_GEN_RE.match(ln)
+                if m_gen and (m_gen.group(1) in present_nics or generated is None):
+                    generated = _normalize_mac_colon(m_gen.group(2))
+    except Exception:
+        return ""
+    mac = address or generated or ""
+    _VMX_MAC_CACHE[key] = (mtime, mac)
+    return mac
+
+
+@lru_cache(maxsize=1)
+def _dhcp_candidate_paths() -> tuple[Path, ...]:
     paths: list[Path] = []
     if DHCP_LEASES_PATHS_RAW:
         for p in DHCP_LEASES_PATHS_RAW.replace(",", ";").split(";"):
@@ -317,29 +401,52 @@ def _dhcp_candidate_paths() -> list[Path]:
         if s not in seen:
             seen.add(s)
             uniq.append(p)
-    return uniq
+    return tuple(uniq)
 
 
-def _parse_dhcp_leases_for_mac(paths: list[Path], mac: str) -> str:
+def _looks_like_ipv4(s: str) -> bool:
+    octets = s.split(".")
+    return len(octets) == 4 and all(o.isdecimal() for o in octets)
+
+
+def _lease_map(path: Path) -> dict[str, str] | None:
+    key = str(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+        hit = _LEASE_CACHE.get(key)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+        data = path.read_text(encoding="utf-8", errors="ignore")
+    except Exception:
+        return None
+    mapping: dict[str, str] = {}
+    current_ip = None
+    for line in data.splitlines():
+        ln = line.strip()
+        if ln.startswith("lease"):
+            head, brace, _ = ln.partition("{")
+            parts = head.split()
+            if brace and len(parts) == 2 and parts[0] == "lease" and _looks_like_ipv4(parts[1]):
+                current_ip = parts[1]
+                continue
+        if current_ip:
+            if ln[:8].lower() == "hardware":
+                parts = ln.lower().split(None, 2)
+                if len(parts) == 3 and parts[1] == "ethernet":
+                    mapping[parts[2][:17]] = current_ip
+            if ln.startswith("}"):
+                current_ip = None
+    _LEASE_CACHE[key] = (mtime, mapping)
+    return mapping
+
+
+def _parse_dhcp_leases_for_mac(paths: Iterable[Path], mac: str) -> str:
     target = _normalize_mac_colon(mac)
     last_ip = ""
     for p in paths:
-        try:
-            data = p.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            continue
-        current_ip = None
-        for line in data.splitlines():
-            ln = line.strip()
-            m_lease = re.match(r"lease\s+(\d+\.\d+\.\d+\.\d+)\s*\{", ln)
-            if m_lease:
-                current_ip = m_lease.group(1)
-                continue
-            if current_ip:
-                if re.search(rf"hardware\s+ethernet\s+{re.escape(target)}", ln, flags=re.IGNORECASE):
-                    last_ip = current_ip
-                if ln.startswith("}"):
-                    current_ip = None
+        mapping = _lease_map(p)
+        if mapping and target in mapping:
+            last_ip = mapping[target]
     return last_ip
 
 
@@ -350,24 +457,16 @@ def _arp_lookup_ip(mac: str) -> str:
         txt = out.stdout or ""
     except Exception:
         return ""
-    for line in txt.splitlines():
-        ln = line.strip().lower()
-        m = re.match(r"(\d+\.\d+\.\d+\.\d+)\s+([0-9a-f\-]{17})\s+(dynamic|static)", ln)
-        if m and m.group(2) == norm_dash:
-            return m.group(1)
+    for line in txt.lower().splitlines():
+        toks = line.split()
+        if len(toks) >= 3 and toks[1] == norm_dash and toks[2] in _ARP_TYPES and _looks_like_ipv4(toks[0]):
+            return toks[0]
     return ""
 
 
 def _is_preferred_ip(ip_str: str) -> bool:
-    try:
-        ip_obj = ipaddress.ip_address(ip_str)
-    except ValueError:
-        return False
-    if any(ip_obj in net for net in EXCLUDE_SUBNETS):
-        return False
-    if not PREFERRED_SUBNETS:
-        return True
-    return any(ip_obj in net for net in PREFERRED_SUBNETS)
+    kind = classify_ip(ip_str)
+    return kind == 1 or (kind == 0 and not PREFERRED_SUBNETS)
 
 
 def _headless_lookup_ip(vmx: Path) -> str: